@@ -0,0 +1,143 @@
+"""
+Servidor HTTP que imita a API JSON do ZAP usada pelo modo nativo.
+
+Spider e scan ativo avançam `progress_step`% a cada consulta de status (a fila
+do scanner passivo, criada pelo spider, esvazia no mesmo ritmo), cada
+resposta espera `latency` segundos e os alertas de qualquer alvo são os
+sintéticos de `benchmarks.synthetic`. Ações sem efeito aqui respondem "OK".
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchmarks.synthetic import synthetic_alerts
+
+
+class FakeZap:
+    def __init__(self, alerts=50, instances=3, progress_step=50, latency=0.0, host="127.0.0.1", port=0):
+        self.alerts = alerts
+        self.instances = instances
+        self.progress_step = progress_step
+        self.latency = latency
+        self.requests = 0
+        self._alerts_by_target = {}
+        self._scans = {"spider": {}, "ascan": {}}
+        self._pscan_records = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-zap", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _target_alerts(self, baseurl):
+        key = urlsplit(baseurl)
+        key = f"{key.scheme}://{key.netloc}"
+        with self._lock:
+            alerts = self._alerts_by_target.get(key)
+            if alerts is None:
+                alerts = list(synthetic_alerts(key, self.alerts, self.instances, seed=len(self._alerts_by_target)))
+                self._alerts_by_target[key] = alerts
+            return alerts
+
+    def _advance(self, component, scan_id):
+        with self._lock:
+            scans = self._scans[component]
+            scans[scan_id] = min(100, scans.get(scan_id, 0) + self.progress_step)
+            return scans[scan_id]
+
+    def _respond(self, component, kind, name, query):
+        if name == "version":
+            return {"version": "2.16.1"}
+        if name == "newContext":
+            return {"contextId": str(next(self._ids))}
+        if name == "scan":
+            scan_id = str(next(self._ids))
+            with self._lock:
+                self._scans[component][scan_id] = 0
+                if component == "spider":
+                    self._pscan_records += self.alerts
+            return {"scan": scan_id}
+        if name == "status":
+            return {"status": str(self._advance(component, query.get("scanId", "")))}
+        if name == "scans":
+            with self._lock:
+                scan_ids = list(self._scans[component])
+            scans = []
+            for scan_id in scan_ids:
+                progress = self._advance(component, scan_id)
+                scans.append({"id": scan_id, "progress": str(progress),
+                              "state": "FINISHED" if progress == 100 else "RUNNING"})
+            return {"scans": scans}
+        if name == "recordsToScan":
+            with self._lock:
+                pending = self._pscan_records
+                self._pscan_records = max(0, pending - max(1, self.alerts * self.progress_step // 100))
+            return {"recordsToScan": str(pending)}
+        if name == "scanPolicyNames":
+            return {"scanPolicyNames": ["Default Policy"]}
+        if name == "alerts":
+            alerts = self._target_alerts(query.get("baseurl", ""))
+            start, count = int(query.get("start", 0)), int(query.get("count", 0) or len(alerts))
+            return {"alerts": alerts[start:start + count]}
+        if name == "messages":
+            urls = sorted({alert["url"] for alert in self._target_alerts(query.get("baseurl", ""))})
+            start, count = int(query.get("start", 0)), int(query.get("count", 0) or len(urls))
+            return {"messages": [
+                {"requestHeader": f"GET {url} HTTP/1.1\r\n", "responseHeader": "HTTP/1.1 200 OK\r\n",
+                 "responseBody": url}
+                for url in urls[start:start + count]
+            ]}
+        return {"Result": "OK"}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                segments = parts.path.strip("/").split("/")
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if len(segments) < 4:
+                    self.send_error(404)
+                    return
+                body = json.dumps(fake._respond(segments[1], segments[2], segments[3], query)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
@@ -0,0 +1,380 @@
+"""
+Benchmarks do ZapScanner, com resultados em JSON para comparar execuções.
+
+    python -m benchmarks.run --out base.json
+    python -m benchmarks.run --only render --alerts 10,1000 --repeat 5 --out head.json
+    python -m benchmarks.run --compare base.json head.json
+
+- render: `render_html_report` com relatórios sintéticos de `--alerts` alertas
+  (`--instances` instâncias cada), nos modos full e lazy.
+- index: `update_reports_index`, `/api/reports` e `/api/reports/delete` com o
+  índice preenchido até cada tamanho de `--index-sizes`.
+- scans: `--scans` chamadas a `/api/scan` por `--clients` clientes simultâneos
+  contra um ZAP falso (`benchmarks/fake_zap.py`), até todos terminarem.
+
+Tudo roda num diretório temporário; o ZAP real não é usado.
+"""
+import argparse
+import contextlib
+import datetime
+import logging
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_zap import FakeZap  # noqa: E402
+from benchmarks.synthetic import synthetic_report  # noqa: E402
+from services import json_codec, report_storage  # noqa: E402
+from services.render import render_html_report, update_reports_index  # noqa: E402
+from services.report_index import get_report_index  # noqa: E402
+
+TEMPLATE = ROOT / "templates" / "model-reports-dark.html"
+BENCHMARKS = ("render", "index", "scans")
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def summarize(samples):
+    """Resumo de uma lista de durações (segundos)."""
+    ordered = sorted(samples)
+    return {
+        "samples": len(ordered),
+        "min": round(ordered[0], 6),
+        "median": round(statistics.median(ordered), 6),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 6),
+        "max": round(ordered[-1], 6),
+        "mean": round(statistics.fmean(ordered), 6),
+    }
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+@contextlib.contextmanager
+def env(**values):
+    previous = {key: os.environ.get(key) for key in values}
+    os.environ.update({key: str(value) for key, value in values.items()})
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def bench_render(workdir, sizes, instances, repeat):
+    results = []
+    reports_dir = workdir / "render"
+    reports_dir.mkdir()
+    with env(REPORTS_DIR=reports_dir):
+        for alerts in sizes:
+            target = f"https://render-{alerts}.example.com"
+            report = synthetic_report(target, alerts, instances)
+            for mode in ("full", "lazy"):
+                samples = []
+                html_path = reports_dir / f"render_{alerts}_{mode}.html"
+                for _ in range(repeat):
+                    json_path = reports_dir / f"render_{alerts}_{mode}.json"
+                    with open(json_path, "w", encoding="utf-8") as f:
+                        json_codec.dump(report, f)
+                    elapsed, ok = timed(render_html_report, str(json_path), str(TEMPLATE), str(html_path), mode)
+                    if not ok:
+                        raise RuntimeError(f"render_html_report falhou ({alerts} alertas, {mode})")
+                    samples.append(elapsed)
+                sizes_on_disk = {
+                    encoding or "identity": path.stat().st_size
+                    for encoding, path in report_storage._variants(html_path)
+                }
+                result = {
+                    "name": f"render[{mode},alerts={alerts},instances={instances}]",
+                    "params": {"mode": mode, "alerts": alerts, "instances": instances},
+                    "seconds": summarize(samples),
+                    "bytes": sizes_on_disk,
+                }
+                log(f"{result['name']}: mediana {result['seconds']['median']:.3f}s")
+                results.append(result)
+    return results
+
+
+def _fill_index(index, start, end, rng):
+    """Preenche o índice com relatórios sintéticos numa única transação."""
+    with index._transaction() as conn:
+        for number in range(start, end):
+            risks = {key: rng.randint(0, 20) for key in ("alto", "medio", "baixo", "informativo")}
+            risks["total"] = sum(risks.values())
+            index._upsert(conn, {
+                "url_executado": f"https://bench-{number:06d}.example.com",
+                "data_execucao": (datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=number))
+                .strftime("%Y-%m-%d %H:%M:%S"),
+                "quantidade_riscos": risks,
+                "resumo": "",
+                "caminho_html": f"bench-{number:06d}.html",
+            })
+        index._touch(conn)
+
+
+def bench_index(workdir, app, sizes, samples, alerts):
+    results = []
+    reports_dir = Path(app.reports_dir)
+    index = get_report_index(reports_dir)
+    client = app.app.test_client()
+    rng = random.Random(0)
+    filled = index.count()
+    with env(REPORTS_DIR=reports_dir):
+        for size in sorted(sizes):
+            log(f"index: preenchendo até {size} relatórios...")
+            _fill_index(index, filled, size, rng)
+            filled = max(filled, size)
+
+            inserted, insert_times = [], []
+            for number in range(samples):
+                target = f"https://insert-{size}-{number}.example.com"
+                json_path = reports_dir / f"insert_{number}.json"
+                html_path = reports_dir / f"insert_{size}_{number}.html"
+                with open(json_path, "w", encoding="utf-8") as f:
+                    json_codec.dump(synthetic_report(target, alerts, 3, seed=number), f)
+                elapsed, run_id = timed(update_reports_index, str(json_path), str(html_path))
+                if not run_id:
+                    raise RuntimeError("update_reports_index falhou")
+                insert_times.append(elapsed)
+                inserted.append((html_path.name, target))
+                json_path.unlink()
+
+            queries = {
+                "first_page": "/api/reports?limit=50",
+                "filtered_sorted": "/api/reports?limit=50&sort=alto&min_alto=10",
+                "url_search": "/api/reports?limit=50&url=bench-0001",
+            }
+            list_times = {}
+            for label, query in queries.items():
+                times = []
+                for _ in range(samples):
+                    elapsed, response = timed(client.get, query)
+                    if response.status_code != 200:
+                        raise RuntimeError(f"{query}: HTTP {response.status_code}")
+                    times.append(elapsed)
+                list_times[label] = summarize(times)
+
+            delete_times = []
+            for filename, target in inserted:
+                elapsed, response = timed(client.delete, f"/api/reports/delete/{filename}/{target}")
+                if response.status_code != 200:
+                    raise RuntimeError(f"delete {filename}: HTTP {response.status_code}")
+                delete_times.append(elapsed)
+
+            result = {
+                "name": f"index[size={size}]",
+                "params": {"size": size, "alerts_per_report": alerts},
+                "update_reports_index": summarize(insert_times),
+                "list_reports": list_times,
+                "delete_report": summarize(delete_times),
+            }
+            log(f"{result['name']}: update {result['update_reports_index']['median'] * 1000:.2f}ms, "
+                f"list {list_times['first_page']['median'] * 1000:.2f}ms, "
+                f"delete {result['delete_report']['median'] * 1000:.2f}ms")
+            results.append(result)
+    return results
+
+
+def bench_scans(app, fake, client_levels, scans, workers, timeout):
+    import requests
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-api", daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=max(client_levels) + 4))
+    results = []
+    try:
+        for clients in client_levels:
+            targets = [f"https://scan-{clients}-{number}.example.com" for number in range(scans)]
+            zap_requests = fake.requests
+            submitted = {}
+
+            def submit(target):
+                started = time.perf_counter()
+                response = session.post(f"{base}/api/scan", json={"url": target})
+                submitted[target] = started
+                return time.perf_counter() - started, response.status_code
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                posted = list(pool.map(submit, targets))
+            rejected = [status for _, status in posted if status != 200]
+
+            finished, end_to_end, statuses = set(), [], {}
+            deadline = time.monotonic() + timeout
+            while len(finished) < len(targets) and time.monotonic() < deadline:
+                for target in targets:
+                    if target in finished:
+                        continue
+                    summary = session.get(f"{base}/api/scan/status/{target}").json()
+                    if summary.get("status") in ("completed", "failed", "cancelled"):
+                        finished.add(target)
+                        end_to_end.append(time.perf_counter() - submitted[target])
+                        statuses[summary["status"]] = statuses.get(summary["status"], 0) + 1
+                time.sleep(0.05)
+            makespan = time.perf_counter() - started
+
+            result = {
+                "name": f"scans[clients={clients},scans={scans},workers={workers}]",
+                "params": {"clients": clients, "scans": scans, "workers": workers,
+                           "zap_alerts": fake.alerts, "zap_latency": fake.latency},
+                "post_scan": summarize([elapsed for elapsed, _ in posted]),
+                "end_to_end": summarize(end_to_end) if end_to_end else None,
+                "makespan": round(makespan, 3),
+                "throughput_per_s": round(len(finished) / makespan, 3),
+                "statuses": statuses,
+                "rejected": len(rejected),
+                "timed_out": len(targets) - len(finished),
+                "zap_requests": fake.requests - zap_requests,
+            }
+            log(f"{result['name']}: {result['throughput_per_s']} scans/s, makespan {result['makespan']}s, "
+                f"{statuses}")
+            results.append(result)
+    finally:
+        server.shutdown()
+    return results
+
+
+def metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "json_backend": json_codec.BACKEND,
+        "brotli": report_storage.brotli is not None,
+        "args": {key: value for key, value in vars(args).items() if key not in ("out", "compare")},
+    }
+
+
+def compare(base_path, head_path):
+    """Mostra a razão entre as medianas (head/base) de cada medição presente nos dois arquivos."""
+    with open(base_path, encoding="utf-8") as f:
+        base = json_codec.load(f)
+    with open(head_path, encoding="utf-8") as f:
+        head = json_codec.load(f)
+
+    def medians(run):
+        values = {}
+        for results in run["results"].values():
+            for result in results:
+                for key, value in result.items():
+                    if isinstance(value, dict) and "median" in value:
+                        values[f"{result['name']} {key}"] = value["median"]
+                    elif isinstance(value, dict):
+                        for sub, summary in value.items():
+                            if isinstance(summary, dict) and "median" in summary:
+                                values[f"{result['name']} {key}.{sub}"] = summary["median"]
+        return values
+
+    base_medians, head_medians = medians(base), medians(head)
+    for name in sorted(set(base_medians) & set(head_medians)):
+        old, new = base_medians[name], head_medians[name]
+        ratio = new / old if old else float("inf")
+        print(f"{ratio:7.2f}x  {old:10.4f}s -> {new:10.4f}s  {name}")
+
+
+def _int_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do ZapScanner")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help="render,index,scans")
+    parser.add_argument("--alerts", type=_int_list, default=[10, 100, 1000, 10000, 100000],
+                        help="tamanhos de relatório (alertas) do benchmark de render")
+    parser.add_argument("--instances", type=int, default=3, help="instâncias por alerta")
+    parser.add_argument("--repeat", type=int, default=3, help="repetições de cada render")
+    parser.add_argument("--index-sizes", type=_int_list, default=[100, 1000, 10000, 100000])
+    parser.add_argument("--index-samples", type=int, default=20, help="operações medidas por tamanho")
+    parser.add_argument("--index-alerts", type=int, default=20, help="alertas por relatório inserido")
+    parser.add_argument("--clients", type=_int_list, default=[1, 4, 16], help="clientes simultâneos")
+    parser.add_argument("--scans", type=int, default=16, help="scans por nível de clientes")
+    parser.add_argument("--workers", type=int, default=4, help="MAX_CONCURRENT_SCANS da API")
+    parser.add_argument("--zap-alerts", type=int, default=50, help="alertas por alvo no ZAP falso")
+    parser.add_argument("--zap-latency", type=float, default=0.0, help="latência (s) de cada chamada ao ZAP falso")
+    parser.add_argument("--scan-timeout", type=float, default=300)
+    parser.add_argument("--out", help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="compara dois resultados e sai")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    selected = [name for name in args.only.split(",") if name]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"benchmark desconhecido: {', '.join(sorted(unknown))}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="zapscanner-bench-"))
+    fake = FakeZap(alerts=args.zap_alerts, latency=args.zap_latency, progress_step=50).start()
+    results = {}
+    try:
+        # prints da API e do render vão para stderr: stdout fica só com o JSON.
+        # A API lê a configuração do ambiente na importação.
+        api_dir = workdir / "api"
+        with contextlib.redirect_stdout(sys.stderr), env(
+            REPORTS_DIR=api_dir, TEMPLATE_DIR=ROOT / "templates", ZAP_ENDPOINTS=fake.url,
+            ZAP_SCAN_MODE="native", MAX_CONCURRENT_SCANS=args.workers,
+            GOOGLE_CHAT_WEBHOOK_URL="", SMTP_HOST="",
+        ):
+            app = None
+            if "index" in selected or "scans" in selected:
+                api_dir.mkdir()
+                sys.path.insert(0, str(ROOT / "src"))
+                import app
+
+            if "render" in selected:
+                results["render"] = bench_render(workdir, args.alerts, args.instances, args.repeat)
+            if "index" in selected:
+                results["index"] = bench_index(workdir, app, args.index_sizes, args.index_samples,
+                                               args.index_alerts)
+            if "scans" in selected:
+                results["scans"] = bench_scans(app, fake, args.clients, args.scans, args.workers,
+                                               args.scan_timeout)
+    finally:
+        fake.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = json_codec.dumps({"meta": metadata(args), "results": results})
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+        log(f"Resultados gravados em {args.out}")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
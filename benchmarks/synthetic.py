@@ -0,0 +1,68 @@
+"""
+Gera alertas e relatórios sintéticos no formato do ZAP, determinísticos pela `seed`.
+"""
+import random
+
+from services.zap_report import build_site_report
+
+RISKS = ("Informational", "Low", "Medium", "High")
+CONFIDENCES = ("Low", "Medium", "High")
+METHODS = ("GET", "GET", "GET", "POST")
+PARAMS = ("", "", "q", "id", "page", "token", "redirect")
+WORDS = (
+    "header", "cookie", "policy", "injection", "script", "content", "response",
+    "request", "server", "missing", "disclosure", "cross", "site", "version",
+)
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def synthetic_alerts(target_url, alerts=100, instances=3, seed=0):
+    """
+    Alertas como os da API `alert/view/alerts` (um item por instância):
+    `alerts` tipos de alerta (pluginId/alertRef distintos) com `instances`
+    URLs afetadas cada.
+    """
+    rng = random.Random(seed)
+    target_url = target_url.rstrip("/")
+    paths = [f"{target_url}/{'/'.join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))}"
+             for _ in range(max(10, instances * 4))]
+    message_id = 0
+    for number in range(alerts):
+        plugin_id = str(10000 + number // 3)
+        name = f"{_sentence(rng, 4)[:-1]} #{number}"
+        base = {
+            "pluginId": plugin_id,
+            "alertRef": f"{plugin_id}-{number % 3 + 1}",
+            "alert": name,
+            "name": name,
+            "risk": rng.choice(RISKS),
+            "confidence": rng.choice(CONFIDENCES),
+            "description": "\n".join(_sentence(rng, 20) for _ in range(2)),
+            "solution": _sentence(rng, 16),
+            "reference": f"https://example.org/ref/{number}\nhttps://cwe.mitre.org/data/definitions/{number % 900}.html",
+            "cweid": str(number % 900),
+            "wascid": str(number % 50),
+            "sourceid": "1",
+            "other": "",
+        }
+        for instance in range(instances):
+            message_id += 1
+            method = rng.choice(METHODS)
+            param = rng.choice(PARAMS)
+            yield {
+                **base,
+                "id": str(message_id),
+                "url": paths[(number + instance) % len(paths)] + (f"?{param}=1" if param else ""),
+                "method": method,
+                "param": param,
+                "attack": "<script>alert(1)</script>" if param and rng.random() < 0.3 else "",
+                "evidence": rng.choice(("", "Server: nginx", "<form>", "X-Powered-By: PHP")),
+            }
+
+
+def synthetic_report(target_url, alerts=100, instances=3, seed=0):
+    """Relatório no formato do `jsonreport`, montado como o modo nativo monta."""
+    return build_site_report(synthetic_alerts(target_url, alerts, instances, seed), target_url)
@@ -0,0 +1,20 @@
+#!/bin/bash
+set -e
+
+ZAP_DAEMONS="${ZAP_DAEMONS:-1}"
+ZAP_BASE_PORT="${ZAP_BASE_PORT:-8090}"
+
+ENDPOINTS=""
+for i in $(seq 0 $((ZAP_DAEMONS - 1))); do
+    PORT=$((ZAP_BASE_PORT + i))
+    ZAP_DIR="/app/.ZAP-$i"
+    mkdir -p "$ZAP_DIR"
+    echo "Iniciando daemon ZAP $i na porta $PORT"
+    /usr/local/bin/zap.sh -daemon -port "$PORT" -host 0.0.0.0 -config api.disablekey=true -dir "$ZAP_DIR" &
+    ENDPOINTS="${ENDPOINTS:+$ENDPOINTS,}http://localhost:$PORT"
+done
+
+export ZAP_ENDPOINTS="${ZAP_ENDPOINTS:-$ENDPOINTS}"
+echo "Daemons ZAP: $ZAP_ENDPOINTS"
+
+exec gunicorn --bind 0.0.0.0:8080 --worker-class gthread --threads 16 src.app:app
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import threading
+
+from services import json_codec
+from services.sqlite_store import SQLiteStore
+
+DB_FILENAME = "baselines.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS baseline_urls (
+    target TEXT NOT NULL,
+    url TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (target, url)
+);
+CREATE TABLE IF NOT EXISTS baseline_alerts (
+    target TEXT NOT NULL,
+    uri TEXT NOT NULL,
+    alert TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_baseline_alerts_target_uri ON baseline_alerts (target, uri);
+"""
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_baseline_store(reports_dir):
+    """Instância compartilhada do store de baselines para o diretório de relatórios."""
+    path = os.path.abspath(os.path.join(reports_dir, DB_FILENAME))
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = BaselineStore(path)
+            _stores[path] = store
+        return store
+
+
+def fingerprint_message(message):
+    """
+    (url, fingerprint) de uma mensagem HTTP do histórico do ZAP.
+
+    O fingerprint é o SHA-1 da linha de status mais o corpo da resposta.
+    """
+    request_line = message.get("requestHeader", "").split("\r\n", 1)[0].split(" ")
+    url = request_line[1] if len(request_line) > 1 else ""
+    status_line = message.get("responseHeader", "").split("\r\n", 1)[0]
+    digest = hashlib.sha1()
+    digest.update(status_line.encode("utf-8", "replace"))
+    digest.update(b"\n")
+    digest.update(message.get("responseBody", "").encode("utf-8", "replace"))
+    return url, digest.hexdigest()
+
+
+class BaselineStore(SQLiteStore):
+    """
+    Último estado conhecido de cada alvo para rescans incrementais: o fingerprint
+    de cada URL encontrada pelo spider e os alertas (formato da API de alertas)
+    do último scan, indexados por URI.
+    """
+
+    schema = SCHEMA
+
+    def fingerprints(self, target):
+        rows = self._conn().execute(
+            "SELECT url, fingerprint FROM baseline_urls WHERE target = ?", (target,)
+        ).fetchall()
+        return {row["url"]: row["fingerprint"] for row in rows}
+
+    def alerts_for(self, target, urls):
+        """Alertas do baseline cujas instâncias estão em `urls`."""
+        urls = set(urls)
+        alerts = []
+        for row in self._conn().execute(
+            "SELECT uri, alert FROM baseline_alerts WHERE target = ?", (target,)
+        ):
+            if row["uri"] in urls:
+                alerts.append(json_codec.loads(row["alert"]))
+        return alerts
+
+    def save(self, target, fingerprints, alerts):
+        """Substitui o baseline do alvo."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM baseline_urls WHERE target = ?", (target,))
+            conn.execute("DELETE FROM baseline_alerts WHERE target = ?", (target,))
+            conn.executemany(
+                "INSERT INTO baseline_urls (target, url, fingerprint) VALUES (?, ?, ?)",
+                ((target, url, fp) for url, fp in fingerprints.items()),
+            )
+            conn.executemany(
+                "INSERT INTO baseline_alerts (target, uri, alert) VALUES (?, ?, ?)",
+                ((target, alert.get("url", ""), json_codec.dumps(alert)) for alert in alerts),
+            )
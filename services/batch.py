@@ -0,0 +1,235 @@
+import hashlib
+import logging
+import os
+import secrets
+import time
+import xml.etree.ElementTree as ET
+import zlib
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import requests
+
+from services import json_codec
+from services.scan_history import DB_FILENAME
+from services.sqlite_store import SQLiteStore
+from services.urls import normalize_target
+
+logger = logging.getLogger("Batch")
+
+MAX_BATCH_URLS = int(os.getenv("BATCH_MAX_URLS", "1000"))
+MAX_SITEMAP_BYTES = 10 * 1024 * 1024
+MAX_SITEMAP_DEPTH = 2
+MAX_SITEMAP_FETCHES = int(os.getenv("BATCH_SITEMAP_MAX_FETCHES", "20"))
+SITEMAP_TIME_BUDGET = float(os.getenv("BATCH_SITEMAP_TIMEOUT", "30"))
+DONE_STATUSES = ("completed", "failed", "cancelled")
+
+
+def _too_large(url):
+    return ValueError(f"Sitemap larger than {MAX_SITEMAP_BYTES // (1024 * 1024)} MB: {url}")
+
+
+def _fetch_sitemap(url, session, timeout, deadline):
+    response = session.get(url, timeout=timeout, stream=True)
+    response.raise_for_status()
+    data = b""
+    for chunk in response.iter_content(64 * 1024):
+        data += chunk
+        if len(data) > MAX_SITEMAP_BYTES:
+            raise _too_large(url)
+        if time.monotonic() > deadline:
+            raise ValueError(f"Sitemap expansion took longer than {SITEMAP_TIME_BUDGET:g}s: {url}")
+    if data[:2] == b"\x1f\x8b":  # sitemap.xml.gz: o limite vale também para o conteúdo descomprimido
+        try:
+            data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(data, MAX_SITEMAP_BYTES + 1)
+        except zlib.error as e:
+            raise ValueError(f"Invalid gzip sitemap {url}: {e}") from e
+        if len(data) > MAX_SITEMAP_BYTES:
+            raise _too_large(url)
+    return data
+
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def expand_sitemap(sitemap_url, max_urls=None, session=None, timeout=15):
+    """
+    URLs de um sitemap (`<urlset>`), seguindo `<sitemapindex>` até
+    `MAX_SITEMAP_DEPTH` níveis e parando em `max_urls` (padrão `BATCH_MAX_URLS`).
+    Aceita sitemaps comprimidos com gzip. Roda dentro da requisição, então baixa
+    no máximo `BATCH_SITEMAP_MAX_FETCHES` sitemaps em `BATCH_SITEMAP_TIMEOUT`
+    segundos. Lança ValueError se o sitemap for inválido ou estourar esses limites.
+    """
+    max_urls = MAX_BATCH_URLS if max_urls is None else max_urls
+    session = session or requests
+    deadline = time.monotonic() + SITEMAP_TIME_BUDGET
+    urls, pending, seen = [], [(sitemap_url, 0)], set()
+    while pending and len(urls) < max_urls:
+        url, depth = pending.pop(0)
+        if url in seen:
+            continue
+        if len(seen) >= MAX_SITEMAP_FETCHES:
+            logger.warning(f"Sitemap {sitemap_url}: limite de {MAX_SITEMAP_FETCHES} sitemaps atingido")
+            break
+        seen.add(url)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise ValueError(f"Sitemap expansion took longer than {SITEMAP_TIME_BUDGET:g}s: {sitemap_url}")
+        try:
+            root = ET.fromstring(_fetch_sitemap(url, session, min(timeout, remaining), deadline))
+        except requests.RequestException as e:
+            raise ValueError(f"Failed to fetch sitemap {url}: {e}") from e
+        except ET.ParseError as e:
+            raise ValueError(f"Invalid sitemap XML {url}: {e}") from e
+
+        locs = [el.text.strip() for el in root.iter() if _local_name(el.tag) == "loc" and el.text]
+        if _local_name(root.tag) == "sitemapindex":
+            if depth < MAX_SITEMAP_DEPTH:
+                pending.extend((loc, depth + 1) for loc in locs)
+            continue
+        urls.extend(locs[:max_urls - len(urls)])
+    return urls
+
+
+def origin_of(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def scope_digest(urls):
+    """Identifica um conjunto de URLs agrupadas (independe da ordem)."""
+    return hashlib.sha1("\n".join(sorted(urls)).encode()).hexdigest()[:8]
+
+
+def group_targets(urls):
+    """
+    Normaliza as URLs e agrupa por origem (esquema + host + porta).
+
+    Retorna `(grupos, rejeitadas)`: cada grupo é `{"key", "urls"}`, em que a
+    chave do scan é a própria URL quando o grupo tem uma só, ou
+    `<origem>#scope-<hash das URLs>` quando várias URLs do mesmo host são
+    varridas juntas: o scan agrupado cobre só essas URLs, então não se mistura
+    com um scan do site inteiro. URLs contidas em outra do mesmo grupo
+    (`/app/x` dentro de `/app`) são descartadas.
+    """
+    groups, rejected = OrderedDict(), []
+    for raw in urls:
+        try:
+            url = normalize_target(str(raw))
+        except ValueError as e:
+            rejected.append({"url": raw, "error": str(e)})
+            continue
+        groups.setdefault(origin_of(url), set()).add(url)
+
+    result = []
+    for origin, members in groups.items():
+        members = sorted(members)
+        scope = [url for url in members
+                 if not any(url != other and url.startswith(other.rstrip("/") + "/") for other in members)]
+        key = scope[0] if len(scope) == 1 else f"{origin}#scope-{scope_digest(scope)}"
+        result.append({"key": key, "urls": scope})
+    return result, rejected
+
+
+BATCHES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_batches_created ON batches (created_at DESC);
+"""
+
+
+def new_batch_id():
+    return secrets.token_hex(8)
+
+
+class BatchStore(SQLiteStore):
+    """
+    Lotes de scan em `REPORTS_DIR/scan_history.db`, ao lado do histórico dos scans.
+
+    Fica no volume compartilhado para que qualquer worker responda pelo lote;
+    só os `max_batches` lotes mais recentes são mantidos.
+    """
+
+    schema = BATCHES_SCHEMA
+
+    def __init__(self, reports_dir, max_batches=200):
+        self.max_batches = max_batches
+        super().__init__(os.path.join(reports_dir, DB_FILENAME))
+
+    def create(self, targets, batch_id=None, **fields):
+        batch = {"batch_id": batch_id or new_batch_id(), "created_at": time.time(), "targets": targets, **fields}
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO batches (batch_id, created_at, data) VALUES (?, ?, ?)",
+                (batch["batch_id"], batch["created_at"], json_codec.dumps(batch)),
+            )
+            conn.execute(
+                """
+                DELETE FROM batches WHERE batch_id NOT IN (
+                    SELECT batch_id FROM batches ORDER BY created_at DESC LIMIT ?
+                )
+                """,
+                (self.max_batches,),
+            )
+        return batch
+
+    def get(self, batch_id):
+        row = self._conn().execute("SELECT data FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        return json_codec.loads(row["data"]) if row else None
+
+
+def _target_progress(state):
+    status = state.get("status")
+    if status in DONE_STATUSES:
+        return 100
+    progress = state.get("progress") or {}
+    return (progress.get("spider", 0) + progress.get("ascan", 0)) // 2
+
+
+def summarize_batch(batch, get_state):
+    """
+    Progresso agregado do lote: status e progresso de cada alvo (pelo
+    `get_state(chave)` do scan_state), contagem por status e soma dos riscos
+    gravados no estado de cada scan concluído.
+    """
+    targets, statuses, progress_total = [], {}, 0
+    risks = {"alto": 0, "medio": 0, "baixo": 0, "informativo": 0, "total": 0}
+    for target in batch["targets"]:
+        state = get_state(target["key"]) or {}
+        status = state.get("status", "unknown")
+        statuses[status] = statuses.get(status, 0) + 1
+        percent = _target_progress(state)
+        progress_total += percent
+        entry = {
+            "url": target["key"],
+            "urls": target["urls"],
+            "status": status,
+            "phase": state.get("phase"),
+            "progress": percent,
+        }
+        if status == "completed":
+            entry["caminho_html"] = state.get("caminho_html")
+            if state.get("quantidade_riscos"):
+                entry["quantidade_riscos"] = state["quantidade_riscos"]
+                for key in risks:
+                    risks[key] += state["quantidade_riscos"].get(key, 0)
+        elif state.get("error"):
+            entry["error"] = state["error"]
+        targets.append(entry)
+
+    done = sum(statuses.get(status, 0) for status in DONE_STATUSES)
+    return {
+        "batch_id": batch["batch_id"],
+        "status": "completed" if done == len(targets) else "running",
+        "profile": batch.get("profile"),
+        "created_at": batch["created_at"],
+        "total": len(targets),
+        "statuses": statuses,
+        "progress": progress_total // len(targets) if targets else 100,
+        "quantidade_riscos": risks,
+        "targets": targets,
+    }
@@ -0,0 +1,185 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele, usa o json da stdlib
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+READ_CHUNK_SIZE = 1024 * 1024
+# Relatórios maiores que isso são lidos em streaming, um alerta por vez
+STREAM_THRESHOLD = int(os.getenv("REPORT_STREAM_THRESHOLD_MB", "64")) * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+
+def loads(data):
+    """Decodifica JSON (str ou bytes)."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, default=None):
+    """Serializa em JSON compacto (sem espaços), retornando str."""
+    if orjson:
+        try:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            pass  # ex.: inteiros maiores que 64 bits; a stdlib aceita
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":"))
+
+
+def load(fp):
+    return loads(fp.read())
+
+
+def dump(obj, fp, default=None):
+    fp.write(dumps(obj, default=default))
+
+
+def load_report(path, stream_threshold=None):
+    """
+    Lê um relatório no formato jsonreport do ZAP.
+
+    Arquivos até `stream_threshold` bytes (padrão `REPORT_STREAM_THRESHOLD_MB`)
+    são carregados inteiros. Acima disso só os metadados vão para a memória:
+    `site[0]["alerts"]` vira um `StreamedAlerts`, que relê o arquivo a cada
+    iteração e decodifica um alerta por vez.
+    """
+    threshold = STREAM_THRESHOLD if stream_threshold is None else stream_threshold
+    if os.path.getsize(path) <= threshold:
+        with open(path, "rb") as f:
+            return loads(f.read())
+
+    report, site = {}, {}
+    for scope, key, value in _walk_report(path, decode_alerts=False):
+        (report if scope == "report" else site)[key] = value
+    site["alerts"] = StreamedAlerts(path)
+    report["site"] = [site]
+    return report
+
+
+class StreamedAlerts:
+    """Alertas do primeiro site de um relatório, decodificados sob demanda do arquivo."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __iter__(self):
+        for scope, key, value in _walk_report(self.path, decode_alerts=True):
+            if scope == "alert":
+                yield value
+
+    def __bool__(self):
+        return next(iter(self), None) is not None
+
+
+class _Reader:
+    """Buffer sobre o arquivo para decodificar valores JSON sem carregar tudo."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.pos > READ_CHUNK_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+        self.buf += chunk
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof:
+                raise ValueError("Fim inesperado do JSON")
+            self._fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"JSON inválido na posição {self.pos}: esperado {char!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # um número no fim do buffer pode estar incompleto
+            if end == len(self.buf) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Itera as chaves de um objeto; o chamador consome cada valor."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+    def elements(self):
+        """Itera os elementos de um array; o chamador consome cada valor."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("]")
+            return
+
+
+def _walk_report(path, decode_alerts):
+    """
+    Percorre o relatório gerando `(escopo, chave, valor)`: campos do topo
+    ("report"), campos do primeiro site ("site") e cada alerta ("alert").
+    Com `decode_alerts=False` os alertas são decodificados e descartados.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _Reader(f)
+        for key in reader.items():
+            if key != "site":
+                yield "report", key, reader.value()
+                continue
+            first_site = True
+            for _ in reader.elements():
+                if not first_site:
+                    reader.value()
+                    continue
+                first_site = False
+                for site_key in reader.items():
+                    if site_key != "alerts":
+                        yield "site", site_key, reader.value()
+                        continue
+                    for _ in reader.elements():
+                        alert = reader.value()
+                        if decode_alerts:
+                            yield "alert", None, alert
@@ -0,0 +1,198 @@
+import bisect
+import functools
+import math
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASE_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200)
+BYTES_BUCKETS = tuple(10 * 1024 * 4 ** i for i in range(8))  # 10 KB .. ~160 MB
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels esperados {self.labelnames}, recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Valor instantâneo; com `set_function` é lido de uma função na hora da coleta."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                self.set(self._function())
+            except Exception:
+                pass  # coleta não pode derrubar o /metrics
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def time(self, **labels):
+        """Mede a duração de um bloco `with` ou de uma função decorada."""
+        return _Timer(self, labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', _format(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __call__(self, func):
+        # um timer novo por chamada: a função decorada pode rodar em várias threads
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Todas as métricas no formato texto do Prometheus."""
+        with self._lock:
+            metrics = list(self._metrics)
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+REGISTRY = Registry()
+
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "zapscanner_scan_queue_depth", "Scans enfileirados aguardando um worker"
+))
+ACTIVE_SCANS = REGISTRY.register(Gauge(
+    "zapscanner_active_scans", "Scans em execução neste processo"
+))
+SCANS = REGISTRY.register(Counter(
+    "zapscanner_scans_total", "Scans finalizados por status e perfil", ("status", "profile")
+))
+SCAN_DURATION = REGISTRY.register(Histogram(
+    "zapscanner_scan_duration_seconds", "Duração total do scan, do início ao relatório indexado",
+    ("profile",), buckets=PHASE_BUCKETS
+))
+SCAN_PHASE = REGISTRY.register(Histogram(
+    "zapscanner_scan_phase_seconds",
+    "Duração de cada fase do scan (spider, ascan, pscan_drain, report_fetch, render, index_update)",
+    ("phase",), buckets=PHASE_BUCKETS
+))
+ZAP_API_LATENCY = REGISTRY.register(Histogram(
+    "zapscanner_zap_api_seconds", "Latência das chamadas à API do ZAP", ("component", "name")
+))
+ZAP_API_ERRORS = REGISTRY.register(Counter(
+    "zapscanner_zap_api_errors_total", "Chamadas à API do ZAP com erro de rede ou HTTP", ("component", "name")
+))
+RENDER_BYTES = REGISTRY.register(Histogram(
+    "zapscanner_render_bytes", "Tamanho do relatório HTML gerado, sem compressão", buckets=BYTES_BUCKETS
+))
+INDEX_LATENCY = REGISTRY.register(Histogram(
+    "zapscanner_report_index_seconds", "Latência das operações no índice de relatórios", ("op", "method")
+))
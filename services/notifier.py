@@ -1,6 +1,11 @@
 # notifier.py
+import os
+import queue
+import random
 import smtplib
 import ssl
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 import requests
@@ -9,18 +14,22 @@ from pathlib import Path
 
 logger = logging.getLogger("Notifier")
 
-def send_google_chat_alert(webhook_url: str, message: str):
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def send_google_chat_alert(webhook_url: str, message: str, session=None, timeout=10):
     """
     Envia uma mensagem de alerta para o Google Chat via Webhook.
 
     :param webhook_url: URL do webhook do Google Chat
     :param message: Mensagem a ser enviada
+    :param session: `requests.Session` reaproveitada entre envios (opcional)
     """
     try:
         headers = {"Content-Type": "application/json; charset=UTF-8"}
         payload = {"text": message}
 
-        response = requests.post(webhook_url, headers=headers, json=payload)
+        response = (session or requests).post(webhook_url, headers=headers, json=payload, timeout=timeout)
         response.raise_for_status()
 
         logger.info("🔔 Alerta enviado para Google Chat com sucesso!")
@@ -30,9 +39,199 @@ def send_google_chat_alert(webhook_url: str, message: str):
         raise
 
 
-# from notifier import send_google_chat_alert
+def send_email(smtp_config: dict, subject: str, message: str, connection=None):
+    """
+    Envia a mensagem por e-mail.
+
+    :param smtp_config: host, port, user, password, sender, recipients, tls ("starttls", "ssl" ou "none")
+    :param connection: conexão SMTP já aberta (`open_smtp`) para reaproveitar num lote
+    """
+    msg = MIMEMultipart()
+    msg["Subject"] = subject
+    msg["From"] = smtp_config["sender"]
+    msg["To"] = ", ".join(smtp_config["recipients"])
+    msg.attach(MIMEText(message, "plain", "utf-8"))
+
+    if connection is not None:
+        connection.send_message(msg)
+    else:
+        with open_smtp(smtp_config) as smtp:
+            smtp.send_message(msg)
+    logger.info(f"📧 E-mail enviado para {msg['To']}")
+
+
+def open_smtp(smtp_config: dict, timeout=10):
+    tls = smtp_config.get("tls", "starttls")
+    if tls == "ssl":
+        smtp = smtplib.SMTP_SSL(smtp_config["host"], smtp_config["port"], timeout=timeout,
+                                context=ssl.create_default_context())
+    else:
+        smtp = smtplib.SMTP(smtp_config["host"], smtp_config["port"], timeout=timeout)
+        if tls == "starttls":
+            smtp.starttls(context=ssl.create_default_context())
+    if smtp_config.get("user"):
+        smtp.login(smtp_config["user"], smtp_config.get("password", ""))
+    return smtp
+
+
+def _is_retryable(error):
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUS
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, (requests.ConnectionError, requests.Timeout, smtplib.SMTPException, OSError))
+
+
+class NotificationDispatcher:
+    """
+    Envio de notificações de fim de scan em segundo plano.
+
+    `notify(evento)` só enfileira e nunca bloqueia nem lança exceção. Uma thread
+    junta os eventos que chegam dentro de `batch_window` segundos (até
+    `max_batch`) numa única mensagem-resumo e envia para cada canal
+    configurado (Google Chat, e-mail), com retentativas e backoff exponencial.
+    A sessão HTTP é reaproveitada entre envios; no e-mail, uma conexão por lote.
+    """
+
+    def __init__(self, google_chat_webhook=None, smtp_config=None, report_base_url="",
+                 batch_window=5.0, max_batch=20, max_retries=4, backoff=1.0, max_queue=1000):
+        self.google_chat_webhook = google_chat_webhook
+        self.smtp_config = smtp_config
+        self.report_base_url = report_base_url.rstrip("/")
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        Canais pelas variáveis `GOOGLE_CHAT_WEBHOOK_URL` e `SMTP_HOST`, `SMTP_PORT`,
+        `SMTP_USER`, `SMTP_PASSWORD`, `SMTP_FROM`, `SMTP_TO` (vírgulas), `SMTP_TLS`.
+        Sem nenhum canal, `notify` não faz nada.
+        """
+        smtp_config = None
+        if os.getenv("SMTP_HOST") and os.getenv("SMTP_TO"):
+            smtp_config = {
+                "host": os.getenv("SMTP_HOST"),
+                "port": int(os.getenv("SMTP_PORT", "587")),
+                "user": os.getenv("SMTP_USER"),
+                "password": os.getenv("SMTP_PASSWORD", ""),
+                "sender": os.getenv("SMTP_FROM", os.getenv("SMTP_USER") or "zapscanner@localhost"),
+                "recipients": [r.strip() for r in os.getenv("SMTP_TO").split(",") if r.strip()],
+                "tls": os.getenv("SMTP_TLS", "starttls"),
+            }
+        return cls(
+            google_chat_webhook=os.getenv("GOOGLE_CHAT_WEBHOOK_URL") or None,
+            smtp_config=smtp_config,
+            report_base_url=os.getenv("REPORT_BASE_URL", ""),
+            batch_window=float(os.getenv("NOTIFY_BATCH_WINDOW", "5")),
+        )
+
+    @property
+    def enabled(self):
+        return bool(self.google_chat_webhook or self.smtp_config)
+
+    def notify(self, event):
+        """
+        Enfileira um evento de fim de scan: `url`, `status` ("completed"/"failed")
+        e opcionalmente `caminho_html`, `quantidade_riscos` e `error`.
+        """
+        if not self.enabled:
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            logger.warning(f"Fila de notificações cheia, evento descartado: {event.get('url')}")
+            return
+        self._ensure_thread()
+
+    def flush(self, timeout=None):
+        """Aguarda o envio dos eventos já enfileirados. Retorna False se o prazo acabar."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._send_batch(batch)
+            except Exception as e:
+                logger.error(f"Erro inesperado ao enviar notificações: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _send_batch(self, batch):
+        subject, message = self.format_batch(batch)
+        if self.google_chat_webhook:
+            self._with_retries("Google Chat", lambda: send_google_chat_alert(
+                self.google_chat_webhook, message, session=self._session
+            ))
+        if self.smtp_config:
+            def send():
+                with open_smtp(self.smtp_config) as smtp:
+                    send_email(self.smtp_config, subject, message, connection=smtp)
+            self._with_retries("e-mail", send)
+
+    def _with_retries(self, channel, send):
+        for attempt in range(self.max_retries + 1):
+            try:
+                send()
+                return True
+            except Exception as e:
+                if attempt == self.max_retries or not _is_retryable(e):
+                    logger.error(f"Notificação via {channel} descartada após {attempt + 1} tentativa(s): {e}")
+                    return False
+                delay = self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+                logger.warning(f"Falha ao notificar via {channel} ({e}); nova tentativa em {delay:.1f}s")
+                time.sleep(delay)
+
+    def _format_event(self, event):
+        url = event.get("url", "")
+        if event.get("status") != "completed":
+            return f"❌ Scan falhou: {url}\nErro: {event.get('error', 'desconhecido')}"
+        line = f"✅ Scan concluído: {url}"
+        riscos = event.get("quantidade_riscos")
+        if riscos:
+            line += (f"\nAlto: {riscos.get('alto', 0)} | Médio: {riscos.get('medio', 0)} | "
+                     f"Baixo: {riscos.get('baixo', 0)} | Informativo: {riscos.get('informativo', 0)}")
+        if event.get("caminho_html"):
+            line += f"\nRelatório: {self.report_base_url}/api/reports/html/{Path(event['caminho_html']).name}"
+        return line
 
-# send_google_chat_alert(
-#     webhook_url="https://chat.googleapis.com/v1/spaces/.../messages?key=...",
-#     message="🚨 Novo scan foi executado!"
-# )
+    def format_batch(self, batch):
+        """(assunto, mensagem): o evento sozinho ou um resumo com todos os eventos do lote."""
+        if len(batch) == 1:
+            event = batch[0]
+            status = "concluído" if event.get("status") == "completed" else "falhou"
+            return f"ZapScanner: scan {status} - {event.get('url', '')}", self._format_event(event)
+        failed = sum(1 for event in batch if event.get("status") != "completed")
+        header = f"📋 {len(batch)} scans finalizados ({len(batch) - failed} concluídos, {failed} com falha)"
+        body = "\n\n".join(self._format_event(event) for event in batch)
+        return f"ZapScanner: {len(batch)} scans finalizados", f"{header}\n\n{body}"
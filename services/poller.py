@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+
+from services.zap_client import ZapApiError
+
+
+class _Watch:
+    def __init__(self, client, kind, scan_id, on_progress):
+        self.client = client
+        self.kind = kind
+        self.scan_id = str(scan_id)
+        self.on_progress = on_progress
+        self.started = time.monotonic()
+        self.next_check = self.started
+        self.interval = None
+        self.progress = -1
+        self.misses = 0
+        self.error = None
+        self.done = threading.Event()
+
+
+class StatusPoller:
+    """
+    Poller único e compartilhado do progresso de spider e scan ativo.
+
+    Todas as esperas ativas são atendidas por uma só thread. A cada rodada é feita
+    uma chamada `spider/view/scans` ou `ascan/view/scans` por daemon ZAP, que
+    devolve o progresso de todos os scans de uma vez, em vez de um `status` por scan.
+
+    O intervalo de cada scan é adaptativo: curto logo após o início e perto de
+    100%, com backoff exponencial enquanto o progresso não muda.
+    """
+
+    def __init__(self, min_interval=0.25, max_interval=5.0, fresh_window=10.0,
+                 near_done=90, max_errors=5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.fresh_window = fresh_window
+        self.near_done = near_done
+        self.max_errors = max_errors
+        self.logger = logging.getLogger('StatusPoller')
+        self._cond = threading.Condition()
+        self._watches = set()
+        self._errors = {}
+        self._thread = None
+
+    def wait(self, client, kind, scan_id, on_progress=None, timeout=None):
+        """
+        Bloqueia até o scan `kind` ("spider" ou "ascan") chegar a 100%.
+
+        `on_progress(percent)` é chamado sempre que o progresso muda.
+        Levanta TimeoutError se `timeout` segundos se passarem antes disso.
+        """
+        if kind not in ("spider", "ascan"):
+            raise ValueError(f"Tipo de scan inválido: {kind}")
+        watch = _Watch(client, kind, scan_id, on_progress)
+        with self._cond:
+            self._watches.add(watch)
+            self._ensure_thread()
+            self._cond.notify()
+        try:
+            if not watch.done.wait(timeout):
+                raise TimeoutError(f"{kind} {scan_id} did not finish in {timeout}s")
+        finally:
+            with self._cond:
+                self._watches.discard(watch)
+        if watch.error:
+            raise watch.error
+        return watch.progress
+
+    def active(self):
+        with self._cond:
+            return len(self._watches)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="zap-status-poller", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    pending = [w for w in self._watches if not w.done.is_set()]
+                    if pending:
+                        now = time.monotonic()
+                        wake_at = min(w.next_check for w in pending)
+                        if wake_at <= now:
+                            break
+                        self._cond.wait(wake_at - now)
+                    else:
+                        self._cond.wait()
+
+                now = time.monotonic()
+                groups = {}
+                for watch in pending:
+                    groups.setdefault((watch.client, watch.kind), []).append(watch)
+                due = {key: watches for key, watches in groups.items()
+                       if any(w.next_check <= now for w in watches)}
+
+            for (client, kind), watches in due.items():
+                self._poll_group(client, kind, watches)
+
+    def _poll_group(self, client, kind, watches):
+        key = (client, kind)
+        try:
+            statuses = client.spider_scans() if kind == "spider" else client.ascan_scans()
+            self._errors.pop(key, None)
+        except Exception as e:
+            errors = self._errors.get(key, 0) + 1
+            self._errors[key] = errors
+            self.logger.warning(f"Falha ao consultar status {kind} ({errors}/{self.max_errors}): {e}")
+            for watch in watches:
+                if errors >= self.max_errors:
+                    watch.error = e if isinstance(e, ZapApiError) else ZapApiError(str(e))
+                    watch.done.set()
+                else:
+                    watch.next_check = time.monotonic() + min(self.max_interval, self.min_interval * 2 ** errors)
+            return
+
+        now = time.monotonic()
+        for watch in watches:
+            progress = statuses.get(watch.scan_id)
+            if progress is None:
+                watch.misses += 1
+                if watch.misses >= self.max_errors:
+                    watch.error = ZapApiError(f"{kind} {watch.scan_id} não encontrado no ZAP")
+                    watch.done.set()
+                else:
+                    watch.next_check = now + self.min_interval
+                continue
+
+            watch.misses = 0
+            changed = progress != watch.progress
+            watch.progress = progress
+            if changed and watch.on_progress:
+                try:
+                    watch.on_progress(progress)
+                except Exception as e:
+                    self.logger.warning(f"Erro no callback de progresso: {e}")
+            if progress >= 100:
+                watch.done.set()
+                continue
+            watch.interval = self._next_interval(watch, changed, now)
+            watch.next_check = now + watch.interval
+
+    def _next_interval(self, watch, changed, now):
+        if now - watch.started < self.fresh_window or watch.progress >= self.near_done:
+            return self.min_interval
+        if watch.interval is None:
+            return self.min_interval
+        if changed:
+            return max(self.min_interval, watch.interval / 2)
+        return min(self.max_interval, watch.interval * 2)
+
+
+default_poller = StatusPoller()
@@ -0,0 +1,96 @@
+import hashlib
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+DEFAULT_PROFILE = "standard"
+
+
+@dataclass(frozen=True)
+class ScanProfile:
+    """
+    Parâmetros de um perfil de scan.
+
+    Durações do ZAP em minutos (0 = sem limite); `timeout` é o prazo total do
+    scan em segundos. `scanners` restringe o scan ativo a esses IDs de regra
+    (None = todas as regras da política).
+    """
+
+    name: str
+    description: str
+    active_scan: bool
+    spider_max_depth: int
+    spider_max_children: int
+    spider_max_duration: int
+    thread_per_host: int
+    max_rule_duration: int
+    max_scan_duration: int
+    attack_strength: str
+    alert_threshold: str
+    timeout: int
+    scanners: Optional[Tuple[int, ...]] = None
+
+    @property
+    def policy_name(self):
+        """Nome da política de scan no ZAP; muda junto com a configuração de regras."""
+        config = f"{self.attack_strength}:{self.alert_threshold}:{self.scanners}"
+        return f"zapscanner-{self.name}-{hashlib.sha1(config.encode()).hexdigest()[:8]}"
+
+    def to_dict(self):
+        data = asdict(self)
+        data["scanners"] = list(self.scanners) if self.scanners is not None else None
+        return data
+
+
+PROFILES = {
+    "quick": ScanProfile(
+        name="quick",
+        description="Spider e scan passivo, sem scan ativo (gates de CI)",
+        active_scan=False,
+        spider_max_depth=3,
+        spider_max_children=10,
+        spider_max_duration=2,
+        thread_per_host=2,
+        max_rule_duration=0,
+        max_scan_duration=0,
+        attack_strength="LOW",
+        alert_threshold="MEDIUM",
+        timeout=300,
+    ),
+    "standard": ScanProfile(
+        name="standard",
+        description="Spider limitado e scan ativo com força média",
+        active_scan=True,
+        spider_max_depth=5,
+        spider_max_children=0,
+        spider_max_duration=3,
+        thread_per_host=4,
+        max_rule_duration=2,
+        max_scan_duration=6,
+        attack_strength="MEDIUM",
+        alert_threshold="MEDIUM",
+        timeout=600,
+    ),
+    "deep": ScanProfile(
+        name="deep",
+        description="Spider profundo e scan ativo com força alta (execuções noturnas)",
+        active_scan=True,
+        spider_max_depth=10,
+        spider_max_children=0,
+        spider_max_duration=20,
+        thread_per_host=8,
+        max_rule_duration=15,
+        max_scan_duration=100,
+        attack_strength="HIGH",
+        alert_threshold="LOW",
+        timeout=7200,
+    ),
+}
+
+
+def get_profile(name=None):
+    """Perfil pelo nome (padrão "standard"). Lança ValueError se não existir."""
+    name = name or DEFAULT_PROFILE
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown scan profile: {name} (available: {', '.join(PROFILES)})") from None
@@ -1,25 +1,45 @@
+import html
 import json
 import os
 import sys
+import threading
 from datetime import datetime
-import os
 from pathlib import Path
 import re
 
+try:
+    from services import report_storage
+    from services.json_codec import load_report
+    from services.metrics import RENDER_BYTES, SCAN_PHASE
+    from services.report_index import get_report_index
+    from services.stats import aggregate_alerts, index_risk_counts
+except ImportError:  # execução direta: python services/render.py
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from services import report_storage
+    from services.json_codec import load_report
+    from services.metrics import RENDER_BYTES, SCAN_PHASE
+    from services.report_index import get_report_index
+    from services.stats import aggregate_alerts, index_risk_counts
+
+PLACEHOLDER_PATTERN = re.compile(r'<!-- (ZAP_[A-Z_]+_PLACEHOLDER) -->')
+
+RISK_MAP_HTML = {
+    '3': {'class': 'high', 'label': 'Alto', 'filter': 'high'},
+    '2': {'class': 'medium', 'label': 'Médio', 'filter': 'medium'},
+    '1': {'class': 'low', 'label': 'Baixo', 'filter': 'low'},
+    '0': {'class': 'info', 'label': 'Informativo', 'filter': 'info'},
+    'High': {'class': 'high', 'label': 'Alto', 'filter': 'high'},
+    'Medium': {'class': 'medium', 'label': 'Médio', 'filter': 'medium'},
+    'Low': {'class': 'low', 'label': 'Baixo', 'filter': 'low'},
+    'Informational': {'class': 'info', 'label': 'Informativo', 'filter': 'info'}
+}
+
+_template_cache = {}
+_template_cache_lock = threading.Lock()
+
 
 def calcular_stats(alertas):
-    stats = {"high": 0, "medium": 0, "low": 0, "info": 0, "total": len(alertas)}
-    for alerta in alertas:
-        risk = str(alerta.get("riskcode", "0"))
-        if risk == "3":
-            stats["high"] += 1
-        elif risk == "2":
-            stats["medium"] += 1
-        elif risk == "1":
-            stats["low"] += 1
-        else: 
-            stats["info"] += 1
-    return stats
+    return aggregate_alerts(alertas)["risks"]
 
 def processar_referencias(reference_text):
     """
@@ -40,35 +60,55 @@ def processar_referencias(reference_text):
 
     links_html = []
     for url in urls:
-        clean_url = url.rstrip('</p>').rstrip('>').rstrip('"').rstrip("'")
+        clean_url = html.escape(url.rstrip('</p>').rstrip('>').rstrip('"').rstrip("'"))
         links_html.append(f'<a href="{clean_url}" target="_blank" rel="noopener noreferrer">{clean_url}</a>')
     
     return '<br>'.join(links_html)
 
-def render_html_report(json_file_path, html_template_path, output_html_path):
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            zap_report_data = json.load(f)
+def compile_template(html_template_path, assets_dir=None):
+    """
+    Divide o template em trechos fixos e placeholders, uma única vez por arquivo.
 
-        with open(html_template_path, 'r', encoding='utf-8') as f:
-            html_template_content = f.read()
+    Com `assets_dir`, o CSS/JS inline vira asset compartilhado nomeado pelo hash
+    do conteúdo (ver `report_storage.extract_assets`). O resultado fica em cache
+    e só é recompilado se o arquivo mudar no disco.
+    """
+    path = str(html_template_path)
+    key = (path, str(assets_dir) if assets_dir else None)
+    mtime = os.stat(path).st_mtime_ns
+    with _template_cache_lock:
+        cached = _template_cache.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        template_html = f.read()
+    if assets_dir:
+        template_html = report_storage.extract_assets(template_html, assets_dir)
+    parts = PLACEHOLDER_PATTERN.split(template_html)
+    # split com grupo alterna texto fixo (índices pares) e nome do placeholder (ímpares)
+    segments = tuple(
+        ('slot', part) if i % 2 else ('text', part)
+        for i, part in enumerate(parts) if part or i % 2
+    )
+    with _template_cache_lock:
+        _template_cache[key] = (mtime, segments)
+    return segments
+
+
+def _format_scan_date(zap_report_data):
+    scan_date_from_report = zap_report_data.get('@generated')
+    if scan_date_from_report:
+        try:
+            dt_obj = datetime.strptime(scan_date_from_report, '%a, %d %b %Y %H:%M:%S %z')
+            return dt_obj.strftime('%d/%m/%Y %H:%M:%S')
+        except ValueError:
+            return scan_date_from_report
+    return datetime.now().strftime("%d/%m/%Y %H:%M:%S")
 
-        site_data = zap_report_data.get("site", [{}])[0]
-        alertas = site_data.get("alerts", [])
-        
-        stats = calcular_stats(alertas)
-        
-        scan_date_from_report = zap_report_data.get('@generated')
-        if scan_date_from_report:
-            try:
-                dt_obj = datetime.strptime(scan_date_from_report, '%a, %d %b %Y %H:%M:%S %z')
-                scan_date_formatted = dt_obj.strftime('%d/%m/%Y %H:%M:%S')
-            except ValueError:
-                scan_date_formatted = scan_date_from_report
-        else:
-            scan_date_formatted = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-
-        summary_cards_html = f"""
+
+def _render_stats(stats):
+    return f"""
             <div class="stat-card">
                 <h3>Total de Alertas</h3>
                 <p>{stats['total']}</p>
@@ -91,57 +131,42 @@ def render_html_report(json_file_path, html_template_path, output_html_path):
             </div>
         """
 
-        alerts_list_html = ''
-        if not alertas:
-            alerts_list_html = """
-                <div class="empty-state" id="empty-message-no-alerts">
-                    <img src="https://cdn-icons-png.flaticon.com/512/4076/4076478.png" alt="Nenhum alerta">
-                    <h3>Nenhuma vulnerabilidade encontrada</h3>
-                    <p>O scan não identificou problemas de segurança.</p>
-                </div>
-            """
-        else:
-            risk_map_html = {
-                '3': {'class': 'high', 'label': 'Alto', 'filter': 'high'},
-                '2': {'class': 'medium', 'label': 'Médio', 'filter': 'medium'},
-                '1': {'class': 'low', 'label': 'Baixo', 'filter': 'low'},
-                '0': {'class': 'info', 'label': 'Informativo', 'filter': 'info'},
-                'High': {'class': 'high', 'label': 'Alto', 'filter': 'high'},
-                'Medium': {'class': 'medium', 'label': 'Médio', 'filter': 'medium'},
-                'Low': {'class': 'low', 'label': 'Baixo', 'filter': 'low'},
-                'Informational': {'class': 'info', 'label': 'Informativo', 'filter': 'info'}
-            }
-            for alerta in alertas:
-                risk_level_key = str(alerta.get('riskcode', '0'))
-                risk_info = risk_map_html.get(risk_level_key)
-                if not risk_info:
-                    risk_info = risk_map_html.get(alerta.get('riskdesc', '').split(' ')[0], {'class': 'info', 'label': 'Desconhecido', 'filter': 'info'})
-
-                instances_html = ''
-                for instance in alerta.get('instances', []):
-                    uri = instance.get('uri', '#')
-                    method = instance.get('method', 'GET')
-                    instances_html += f"""
+
+def _render_alert(alerta):
+    """
+    Renderiza um alerta. Campos vindos do alvo (URIs, métodos, nomes) são escapados;
+    descrição, solução e referência já chegam do ZAP como HTML.
+    """
+    risk_level_key = str(alerta.get('riskcode', '0'))
+    risk_info = RISK_MAP_HTML.get(risk_level_key)
+    if not risk_info:
+        risk_info = RISK_MAP_HTML.get(alerta.get('riskdesc', '').split(' ')[0], {'class': 'info', 'label': 'Desconhecido', 'filter': 'info'})
+
+    instances = alerta.get('instances', [])
+    instance_items = []
+    for instance in instances:
+        uri = html.escape(instance.get('uri', '#'))
+        method = html.escape(instance.get('method', 'GET'))
+        instance_items.append(f"""
                         <li><strong>URI:</strong> <a href="{uri}" target="_blank">{uri}</a> ({method})</li>
-                    """
-                if not instances_html:
-                    instances_html = '<li>Nenhuma URL específica encontrada</li>'
-
-                alert_name = alerta.get('name', 'Alerta sem nome')
-                alert_desc = alerta.get('desc', 'Sem descrição disponível.')
-                alert_solution = alerta.get('solution', 'Sem solução recomendada disponível.')
-                alert_reference = alerta.get('reference')
-                alert_cweid = alerta.get('cweid', 'N/A')
-                alert_wascid = alerta.get('wascid', 'N/A')
-
-                ref_html = f"""
+                    """)
+    instances_html = ''.join(instance_items) or '<li>Nenhuma URL específica encontrada</li>'
+
+    alert_name = html.escape(alerta.get('name', 'Alerta sem nome'))
+    alert_desc = alerta.get('desc', 'Sem descrição disponível.')
+    alert_solution = alerta.get('solution', 'Sem solução recomendada disponível.')
+    alert_reference = alerta.get('reference')
+    alert_cweid = html.escape(str(alerta.get('cweid', 'N/A')))
+    alert_wascid = html.escape(str(alerta.get('wascid', 'N/A')))
+
+    ref_html = f"""
                     <div class="alert-section">
                         <h4>Referência</h4>
                         <p><p>{processar_referencias(alert_reference)}</p></p>
                     </div>
                 """ if alert_reference else ''
 
-                alerts_list_html += f"""
+    return f"""
                     <div class="alert alert-{risk_info['class']}" data-riskcode="{risk_info['filter']}">
                         <div class="alert-header">
                             <h3 class="alert-title">{alert_name}</h3>
@@ -166,7 +191,7 @@ def render_html_report(json_file_path, html_template_path, output_html_path):
                                     <p>{alert_wascid}</p>
                                 </div>
                                 <div class="alert-section">
-                                    <h4>URLs Afetadas ({len(alerta.get('instances', []))})</h4>
+                                    <h4>URLs Afetadas ({len(instances)})</h4>
                                     <ul class="url-list">
                                         {instances_html}
                                     </ul>
@@ -177,26 +202,156 @@ def render_html_report(json_file_path, html_template_path, output_html_path):
                         </div>
                     </div>
                 """
-        
-        html_template_content = html_template_content.replace(
-            "<!-- ZAP_SCAN_DATE_PLACEHOLDER -->", scan_date_formatted
-        )
 
-        html_template_content = html_template_content.replace(
-            "<!-- ZAP_STATS_PLACEHOLDER -->", summary_cards_html
-        )
 
-        html_template_content = html_template_content.replace(
-            "<!-- ZAP_ALERTS_LIST_PLACEHOLDER -->", alerts_list_html
-        )
+def _render_changes(changes):
+    """Seção "mudanças desde o último scan": contagens e alertas novos/corrigidos agrupados por nome."""
+    if changes is None:
+        return ''
+
+    def grouped(findings):
+        groups = {}
+        for finding in findings:
+            key = (finding['riskcode'], finding['name'])
+            groups[key] = groups.get(key, 0) + 1
+        items = []
+        for (riskcode, name), count in sorted(groups.items(), key=lambda item: (-int(item[0][0] or 0), item[0][1])):
+            risk_info = RISK_MAP_HTML.get(str(riskcode), RISK_MAP_HTML['0'])
+            items.append(f"""
+                        <li><span class="{risk_info['class']}">{risk_info['label']}</span> {html.escape(name)} ({count})</li>
+                    """)
+        return ''.join(items) or '<li>Nenhum</li>'
+
+    return f"""
+            <div class="alert-section" id="changes-since-last-scan">
+                <h4>Mudanças desde o último scan ({html.escape(changes['base']['data_execucao'])})</h4>
+                <div class="stats">
+                    <div class="stat-card">
+                        <h3>Novos</h3>
+                        <p class="high">{len(changes['new'])}</p>
+                    </div>
+                    <div class="stat-card">
+                        <h3>Corrigidos</h3>
+                        <p class="low">{len(changes['fixed'])}</p>
+                    </div>
+                    <div class="stat-card">
+                        <h3>Persistentes</h3>
+                        <p>{len(changes['unchanged'])}</p>
+                    </div>
+                </div>
+                <h4>Novos</h4>
+                <ul class="url-list">{grouped(changes['new'])}</ul>
+                <h4>Corrigidos</h4>
+                <ul class="url-list">{grouped(changes['fixed'])}</ul>
+            </div>
+        """
 
-        with open(output_html_path, 'w', encoding='utf-8') as f:
-            f.write(html_template_content)
+
+def _render_alerts(alertas):
+    if not alertas:
+        yield """
+                <div class="empty-state" id="empty-message-no-alerts">
+                    <img src="https://cdn-icons-png.flaticon.com/512/4076/4076478.png" alt="Nenhum alerta">
+                    <h3>Nenhuma vulnerabilidade encontrada</h3>
+                    <p>O scan não identificou problemas de segurança.</p>
+                </div>
+            """
+        return
+    for alerta in alertas:
+        yield _render_alert(alerta)
+
+
+def _render_lazy_alerts(run_id):
+    """Shell do modo lazy: o JS do template busca os alertas em `/api/reports/<run_id>/alerts`."""
+    return f"""
+                <div id="lazy-alerts" data-alerts-url="../{int(run_id)}/alerts"></div>
+                <button id="carregar-mais-alertas" class="ver-mais-btn" style="display:none">Carregar mais alertas</button>
+            """
+
+
+def iter_html_report(zap_report_data, html_template_path, changes=None, assets_dir=None, run_id=None, stats=None):
+    """
+    Gera o HTML do relatório em pedaços, na ordem do template.
+
+    Serve tanto para escrever em arquivo quanto como corpo de uma resposta HTTP
+    em streaming; só um alerta é renderizado em memória por vez. `changes`
+    (ver `ReportIndex.changes_since_last_run`) preenche o placeholder opcional
+    de mudanças desde o último scan. Com `run_id` (modo lazy) a lista de
+    alertas não é embutida: o navegador a carrega em páginas pela API.
+    `stats` (de `aggregate_alerts`) evita recalcular as estatísticas.
+    """
+    segments = compile_template(html_template_path, assets_dir)
+
+    site_data = zap_report_data.get("site", [{}])[0]
+    alertas = site_data.get("alerts", [])
+    risks = stats["risks"] if stats else calcular_stats(alertas)
+
+    for kind, value in segments:
+        if kind == 'text':
+            yield value
+        elif value == 'ZAP_SCAN_DATE_PLACEHOLDER':
+            yield html.escape(_format_scan_date(zap_report_data))
+        elif value == 'ZAP_STATS_PLACEHOLDER':
+            yield _render_stats(risks)
+        elif value == 'ZAP_CHANGES_PLACEHOLDER':
+            yield _render_changes(changes)
+        elif value == 'ZAP_ALERTS_LIST_PLACEHOLDER':
+            if run_id is not None:
+                yield _render_lazy_alerts(run_id)
+            else:
+                yield from _render_alerts(alertas)
+
+
+def write_html_report(chunks, output_html_path):
+    """Grava os pedaços já comprimidos (`.html.gz`/`.html.br`, ver `report_storage.write_report`)."""
+    with SCAN_PHASE.time(phase="render"):
+        size = report_storage.write_report(chunks, output_html_path)
+    RENDER_BYTES.observe(size)
+    return size
+
+
+def render_html_report(json_file_path, html_template_path, output_html_path, mode=None, target=None, profile=None):
+    """
+    Gera o relatório HTML a partir do JSON do ZAP e o registra no índice.
+
+    `mode` (padrão `REPORT_MODE`, "full"): "full" embute todos os alertas;
+    "lazy" grava só resumo e shell, e os alertas são servidos pela API.
+    `target` e `profile` identificam a série de execuções comparadas nas
+    mudanças desde o último scan (ver `ReportIndex.record_run`).
+    """
+    mode = mode or os.getenv("REPORT_MODE", "full")
+    try:
+        zap_report_data = load_report(json_file_path)
+
+        site_data = zap_report_data.get("site", [{}])[0]
+        stats = aggregate_alerts(site_data.get("alerts", []))
+
+        changes = None
+        try:
+            changes = _reports_index_for(output_html_path).changes_since_last_run(
+                site_data.get("@name", "URL não identificada"), site_data.get("alerts", []), target, profile
+            )
+        except Exception as e:
+            print(f"⚠️ Não foi possível comparar com o último scan: {e}")
+
+        run_id = None
+        if mode == "lazy":
+            # o shell precisa do run_id para buscar os alertas, então o índice é gravado antes
+            run_id = update_reports_index(json_file_path, output_html_path, zap_report_data, stats, target, profile)
+            if not run_id:
+                print("⚠️ Falha ao atualizar índice de relatórios")
+                return False
+
+        assets_dir = Path(output_html_path).parent / report_storage.ASSETS_DIRNAME
+        write_html_report(
+            iter_html_report(zap_report_data, html_template_path, changes, assets_dir, run_id, stats),
+            output_html_path
+        )
 
         print(f"Relatório HTML final gerado em: {output_html_path}")
         
         try:
-            if update_reports_index(json_file_path, output_html_path):
+            if run_id or update_reports_index(json_file_path, output_html_path, zap_report_data, stats, target, profile):
                 print("📋 Índice de relatórios atualizado")
 
                 json_file_reports = Path(json_file_path)
@@ -224,33 +379,29 @@ def render_html_report(json_file_path, html_template_path, output_html_path):
         return False
 
 
-def update_reports_index(json_file_path, html_file_path):
-    try:
-        reports_dir = os.getenv("REPORTS_DIR", os.path.dirname(html_file_path))
-        os.makedirs(reports_dir, exist_ok=True)
+def _reports_index_for(html_file_path):
+    return get_report_index(os.getenv("REPORTS_DIR", os.path.dirname(html_file_path)))
 
-        index_filename = os.path.join(reports_dir, "reports_index.json")
-        
-        if os.path.exists(index_filename):
-            with open(index_filename, 'r', encoding='utf-8') as f:
-                reports_index = json.load(f)
-        else:
-            reports_index = []
 
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            report_data = json.load(f)
+@SCAN_PHASE.time(phase="index_update")
+def update_reports_index(json_file_path, html_file_path, report_data=None, stats=None, target=None, profile=None):
+    """
+    Registra o relatório no índice. `report_data` e `stats` já calculados pelo
+    chamador evitam reler o JSON e percorrer os alertas de novo.
+    """
+    try:
+        reports_index = _reports_index_for(html_file_path)
+
+        if report_data is None:
+            report_data = load_report(json_file_path)
 
         site_data = report_data.get("site", [{}])[0]
         url_executado = site_data.get("@name", "URL não identificada")
 
         alertas = site_data.get("alerts", [])
-        quantidade_riscos = {
-            "alto": sum(1 for a in alertas if str(a.get("riskcode", "0")) == "3"),
-            "medio": sum(1 for a in alertas if str(a.get("riskcode", "0")) == "2"),
-            "baixo": sum(1 for a in alertas if str(a.get("riskcode", "0")) == "1"),
-            "informativo": sum(1 for a in alertas if str(a.get("riskcode", "0")) not in ["1", "2", "3"]),
-            "total": len(alertas)
-        }
+        if stats is None:
+            stats = aggregate_alerts(alertas)
+        quantidade_riscos = index_risk_counts(stats)
 
         data_execucao = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         caminho_html = os.path.basename(html_file_path)
@@ -263,19 +414,11 @@ def update_reports_index(json_file_path, html_file_path):
             "caminho_html": caminho_html
         }
 
-        for i, existing_record in enumerate(reports_index):
-            if existing_record.get("url_executado") == url_executado:
-                reports_index[i] = report_record
-                break
-        else:
-            reports_index.append(report_record)
+        run_id = reports_index.record_run(report_record, alertas, stats, target, profile)
 
-        with open(index_filename, 'w', encoding='utf-8') as f:
-            json.dump(reports_index, f, indent=2, ensure_ascii=False)
-
-        print(f"📋 Índice de relatórios atualizado localmente: {index_filename}")
+        print(f"📋 Índice de relatórios atualizado localmente: {reports_index.db_path}")
         
-        return True
+        return run_id
 
     except Exception as e:
         print(f"Erro ao atualizar índice local: {e}")
@@ -0,0 +1,720 @@
+import base64
+import json
+import logging
+import os
+import threading
+import time
+
+from services import json_codec
+from services.metrics import INDEX_LATENCY
+from services.profiles import DEFAULT_PROFILE
+from services.sqlite_store import SQLiteStore
+
+DB_FILENAME = "reports_index.db"
+LEGACY_JSON_FILENAME = "reports_index.json"
+
+RISK_COLUMNS = ("alto", "medio", "baixo", "informativo", "total")
+SORT_COLUMNS = ("data_execucao", "url_executado") + RISK_COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    url_executado TEXT PRIMARY KEY,
+    data_execucao TEXT NOT NULL,
+    alto INTEGER NOT NULL DEFAULT 0,
+    medio INTEGER NOT NULL DEFAULT 0,
+    baixo INTEGER NOT NULL DEFAULT 0,
+    informativo INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    resumo TEXT NOT NULL DEFAULT '',
+    caminho_html TEXT NOT NULL
+);
+DROP INDEX IF EXISTS idx_reports_data;
+DROP INDEX IF EXISTS idx_reports_alto;
+CREATE INDEX IF NOT EXISTS idx_reports_data_url ON reports (data_execucao, url_executado);
+CREATE INDEX IF NOT EXISTS idx_reports_alto_url ON reports (alto, url_executado);
+CREATE INDEX IF NOT EXISTS idx_reports_total_url ON reports (total, url_executado);
+CREATE INDEX IF NOT EXISTS idx_reports_html ON reports (caminho_html);
+CREATE TABLE IF NOT EXISTS scan_results (
+    target TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    caminho_html TEXT NOT NULL,
+    PRIMARY KEY (target, profile)
+);
+CREATE INDEX IF NOT EXISTS idx_scan_results_html ON scan_results (caminho_html);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url_executado TEXT NOT NULL,
+    data_execucao TEXT NOT NULL,
+    caminho_html TEXT NOT NULL,
+    target TEXT NOT NULL DEFAULT '',
+    profile TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_runs_url ON runs (url_executado, run_id);
+CREATE TABLE IF NOT EXISTS alert_catalog (
+    alert_id INTEGER PRIMARY KEY,
+    pluginid TEXT NOT NULL,
+    alert_ref TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    riskcode TEXT NOT NULL DEFAULT '0',
+    confidence TEXT NOT NULL DEFAULT '',
+    riskdesc TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    solution TEXT NOT NULL DEFAULT '',
+    reference TEXT NOT NULL DEFAULT '',
+    cweid TEXT NOT NULL DEFAULT '',
+    wascid TEXT NOT NULL DEFAULT '',
+    UNIQUE (pluginid, alert_ref)
+);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL,
+    alert_id INTEGER NOT NULL,
+    uri TEXT NOT NULL,
+    method TEXT NOT NULL,
+    param TEXT NOT NULL,
+    PRIMARY KEY (run_id, alert_id, uri, method, param)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_alerts (
+    run_id INTEGER NOT NULL,
+    alert_id INTEGER NOT NULL,
+    instances INTEGER NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    riskcode TEXT NOT NULL DEFAULT '0',
+    confidence TEXT NOT NULL DEFAULT '',
+    riskdesc TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (run_id, alert_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS run_stats (
+    run_id INTEGER PRIMARY KEY,
+    stats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+FINDING_KEY = ("pluginid", "alertRef", "uri", "method", "param")
+# classificação do alerta (nome, risco, confiança) é a da execução, em `run_alerts`
+RUN_ALERT_COLUMNS = ("name", "riskcode", "confidence", "riskdesc")
+FINDING_COLUMNS = "c.pluginid, c.alert_ref AS alertRef, r.name, r.riskcode, f.uri, f.method, f.param"
+FINDING_JOIN = """
+    findings f JOIN alert_catalog c ON c.alert_id = f.alert_id
+    JOIN run_alerts r ON r.run_id = f.run_id AND r.alert_id = f.alert_id
+"""
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _timed(op):
+    """Registra a latência do método em `zapscanner_report_index_seconds`."""
+    def decorator(func):
+        return INDEX_LATENCY.time(op=op, method=func.__name__)(func)
+    return decorator
+
+
+def get_report_index(reports_dir):
+    """Instância compartilhada do índice para o diretório de relatórios."""
+    path = os.path.abspath(os.path.join(reports_dir, DB_FILENAME))
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = ReportIndex(reports_dir)
+            _indexes[path] = index
+        return index
+
+
+class ReportIndex(SQLiteStore):
+    """
+    Índice de relatórios em SQLite (modo WAL) no volume de relatórios.
+
+    Substitui o `reports_index.json`: inserção, remoção e busca por URL usam a
+    chave primária/índices, e vários processos podem escrever ao mesmo tempo.
+    Na primeira abertura o JSON legado é importado e renomeado para `.migrated`.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, reports_dir, run_history=None):
+        self.reports_dir = reports_dir
+        self.run_history = run_history or int(os.getenv("REPORT_RUN_HISTORY", "20"))
+        self.logger = logging.getLogger('ReportIndex')
+        super().__init__(os.path.join(reports_dir, DB_FILENAME))
+        self._migrate_legacy_json()
+        self._migrate_run_alerts()
+        self._migrate_runs()
+
+    def _migrate_legacy_json(self):
+        json_path = os.path.join(self.reports_dir, LEGACY_JSON_FILENAME)
+        if not os.path.exists(json_path):
+            return
+        with self._transaction() as conn:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if done:
+                return
+            try:
+                with open(json_path, "r", encoding="utf-8") as f:
+                    records = json.load(f)
+            except (OSError, ValueError) as e:
+                self.logger.error(f"Falha ao ler índice legado {json_path}: {e}")
+                return
+            for record in records:
+                self._upsert(conn, record)
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)",
+                         (str(len(records)),))
+            self._touch(conn)
+        os.replace(json_path, json_path + ".migrated")
+        self.logger.info(f"Índice legado migrado para SQLite: {len(records)} relatórios")
+
+    def _migrate_run_alerts(self):
+        """Índices antigos guardavam a classificação só no catálogo: copia para cada execução."""
+        with self._transaction() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(run_alerts)")}
+            if "riskcode" in columns:
+                return
+            conn.execute("ALTER TABLE run_alerts ADD COLUMN name TEXT NOT NULL DEFAULT ''")
+            conn.execute("ALTER TABLE run_alerts ADD COLUMN riskcode TEXT NOT NULL DEFAULT '0'")
+            conn.execute("ALTER TABLE run_alerts ADD COLUMN confidence TEXT NOT NULL DEFAULT ''")
+            conn.execute("ALTER TABLE run_alerts ADD COLUMN riskdesc TEXT NOT NULL DEFAULT ''")
+            conn.execute(
+                """
+                UPDATE run_alerts SET (name, riskcode, confidence, riskdesc) = (
+                    SELECT c.name, c.riskcode, c.confidence, c.riskdesc
+                    FROM alert_catalog c WHERE c.alert_id = run_alerts.alert_id
+                )
+                """
+            )
+        self.logger.info("Classificação dos alertas copiada para run_alerts")
+
+    def _migrate_runs(self):
+        """Execuções antigas não tinham alvo/perfil: viram execuções da origem com o perfil padrão."""
+        with self._transaction() as conn:
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "target" not in columns:
+                conn.execute("ALTER TABLE runs ADD COLUMN target TEXT NOT NULL DEFAULT ''")
+                conn.execute("ALTER TABLE runs ADD COLUMN profile TEXT NOT NULL DEFAULT ''")
+            conn.execute(
+                "UPDATE runs SET target = url_executado, profile = ? WHERE target = ''", (DEFAULT_PROFILE,)
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_target ON runs (target, profile, run_id)")
+
+    @staticmethod
+    def _upsert(conn, record):
+        riscos = record.get("quantidade_riscos", {})
+        conn.execute(
+            """
+            INSERT INTO reports (url_executado, data_execucao, alto, medio, baixo, informativo,
+                                 total, resumo, caminho_html)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (url_executado) DO UPDATE SET
+                data_execucao = excluded.data_execucao,
+                alto = excluded.alto,
+                medio = excluded.medio,
+                baixo = excluded.baixo,
+                informativo = excluded.informativo,
+                total = excluded.total,
+                resumo = excluded.resumo,
+                caminho_html = excluded.caminho_html
+            """,
+            (
+                record["url_executado"],
+                record.get("data_execucao", ""),
+                *(int(riscos.get(col, 0)) for col in RISK_COLUMNS),
+                record.get("resumo", ""),
+                record.get("caminho_html", ""),
+            ),
+        )
+
+    @staticmethod
+    def _touch(conn):
+        """Incrementa a geração do índice; usada como ETag/Last-Modified da listagem."""
+        conn.execute(
+            """
+            INSERT INTO meta (key, value) VALUES ('generation', '1')
+            ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+            """
+        )
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('updated_at', ?)", (str(time.time()),))
+
+    @_timed("read")
+    def version(self):
+        """(geração, timestamp da última escrita) — consulta barata para requisições condicionais."""
+        rows = dict(self._conn().execute(
+            "SELECT key, value FROM meta WHERE key IN ('generation', 'updated_at')"
+        ).fetchall())
+        return int(rows.get("generation", 0)), float(rows.get("updated_at", 0))
+
+    @staticmethod
+    def _to_record(row):
+        return {
+            "url_executado": row["url_executado"],
+            "data_execucao": row["data_execucao"],
+            "quantidade_riscos": {col: row[col] for col in RISK_COLUMNS},
+            "resumo": row["resumo"],
+            "caminho_html": row["caminho_html"],
+        }
+
+    @_timed("write")
+    def upsert(self, record):
+        """Insere ou substitui o relatório da mesma `url_executado`."""
+        with self._transaction() as conn:
+            self._upsert(conn, record)
+            self._touch(conn)
+
+    @_timed("write")
+    def record_run(self, record, alerts, stats=None, target=None, profile=None):
+        """
+        Grava o relatório no índice e os achados da execução (uma linha por
+        alerta × instância) para comparação entre scans. Textos do alerta ficam
+        uma única vez no catálogo; nome, risco e confiança são gravados por
+        execução, para que execuções antigas não mudem. `target` (alvo
+        normalizado, padrão `url_executado`) e `profile` identificam a série de
+        execuções comparáveis; mantém as últimas `run_history` de cada série.
+        `stats` (de `services.stats.aggregate_alerts`) é guardado junto.
+        Retorna o `run_id`.
+        """
+        target = target or record["url_executado"]
+        profile = profile or DEFAULT_PROFILE
+        with self._transaction() as conn:
+            self._upsert(conn, record)
+            run_id = conn.execute(
+                """
+                INSERT INTO runs (url_executado, data_execucao, caminho_html, target, profile)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (record["url_executado"], record.get("data_execucao", ""), record.get("caminho_html", ""),
+                 target, profile),
+            ).lastrowid
+            rows, counts, classification = set(), {}, {}
+            for alert in alerts:
+                alert_id = self._catalog_id(conn, alert)
+                classification[alert_id] = (
+                    alert.get("name", alert.get("alert", "")),
+                    str(alert.get("riskcode", "0")),
+                    str(alert.get("confidence", "")),
+                    alert.get("riskdesc", ""),
+                )
+                for instance in alert.get("instances", []):
+                    row = (run_id, alert_id, instance.get("uri", ""),
+                           instance.get("method", ""), instance.get("param", ""))
+                    if row not in rows:
+                        rows.add(row)
+                        counts[alert_id] = counts.get(alert_id, 0) + 1
+            conn.executemany(
+                "INSERT INTO findings (run_id, alert_id, uri, method, param) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.executemany(
+                f"""
+                INSERT INTO run_alerts (run_id, alert_id, instances, {', '.join(RUN_ALERT_COLUMNS)})
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                ((run_id, alert_id, count, *classification[alert_id]) for alert_id, count in counts.items()),
+            )
+            if stats is not None:
+                conn.execute(
+                    "INSERT INTO run_stats (run_id, stats) VALUES (?, ?)",
+                    (run_id, json_codec.dumps(stats)),
+                )
+            stale = conn.execute(
+                """
+                SELECT run_id FROM runs WHERE target = ? AND profile = ?
+                ORDER BY run_id DESC LIMIT -1 OFFSET ?
+                """,
+                (target, profile, self.run_history),
+            ).fetchall()
+            for row in stale:
+                self._delete_run(conn, row["run_id"])
+            self._touch(conn)
+        return run_id
+
+    @staticmethod
+    def _catalog_id(conn, alert):
+        conn.execute(
+            """
+            INSERT INTO alert_catalog (pluginid, alert_ref, name, riskcode, confidence, riskdesc,
+                                       description, solution, reference, cweid, wascid)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (pluginid, alert_ref) DO UPDATE SET
+                name = excluded.name,
+                riskcode = excluded.riskcode,
+                confidence = excluded.confidence,
+                riskdesc = excluded.riskdesc,
+                description = excluded.description,
+                solution = excluded.solution,
+                reference = excluded.reference,
+                cweid = excluded.cweid,
+                wascid = excluded.wascid
+            """,
+            (
+                str(alert.get("pluginid", "")),
+                str(alert.get("alertRef", alert.get("pluginid", ""))),
+                alert.get("name", alert.get("alert", "")),
+                str(alert.get("riskcode", "0")),
+                str(alert.get("confidence", "")),
+                alert.get("riskdesc", ""),
+                alert.get("desc", ""),
+                alert.get("solution", ""),
+                alert.get("reference", ""),
+                str(alert.get("cweid", "")),
+                str(alert.get("wascid", "")),
+            ),
+        )
+        return conn.execute(
+            "SELECT alert_id FROM alert_catalog WHERE pluginid = ? AND alert_ref = ?",
+            (str(alert.get("pluginid", "")), str(alert.get("alertRef", alert.get("pluginid", "")))),
+        ).fetchone()["alert_id"]
+
+    @staticmethod
+    def _delete_run(conn, run_id):
+        conn.execute("DELETE FROM findings WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM run_alerts WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM run_stats WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    @staticmethod
+    def _to_run(row):
+        return {
+            "run_id": row["run_id"],
+            "url_executado": row["url_executado"],
+            "data_execucao": row["data_execucao"],
+            "caminho_html": row["caminho_html"],
+            "target": row["target"],
+            "profile": row["profile"],
+        }
+
+    @_timed("read")
+    def get_run(self, run_id):
+        row = self._conn().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._to_run(row) if row else None
+
+    @_timed("read")
+    def run_stats(self, run_id):
+        """Estatísticas gravadas da execução, ou None."""
+        row = self._conn().execute("SELECT stats FROM run_stats WHERE run_id = ?", (run_id,)).fetchone()
+        return json_codec.loads(row["stats"]) if row else None
+
+    @_timed("read")
+    def runs(self, url, limit=None, profile=None):
+        """Execuções de uma URL (`url_executado` ou alvo), mais recentes primeiro."""
+        sql = "SELECT * FROM runs WHERE (url_executado = ? OR target = ?)"
+        params = [url, url]
+        if profile:
+            sql += " AND profile = ?"
+            params.append(profile)
+        sql += " ORDER BY run_id DESC"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [self._to_run(row) for row in self._conn().execute(sql, params)]
+
+    @_timed("read")
+    def last_run(self, target, profile, before=None):
+        """Execução mais recente da série (alvo + perfil), opcionalmente anterior ao run_id `before`."""
+        sql = "SELECT * FROM runs WHERE target = ? AND profile = ?"
+        params = [target, profile]
+        if before is not None:
+            sql += " AND run_id < ?"
+            params.append(int(before))
+        row = self._conn().execute(sql + " ORDER BY run_id DESC LIMIT 1", params).fetchone()
+        return self._to_run(row) if row else None
+
+    @_timed("read")
+    def run_alerts(self, run_id, riskcode=None, offset=0, limit=50):
+        """
+        Página de alertas de uma execução (um item por alerta, com a quantidade
+        de instâncias), do maior risco para o menor. Retorna `(alertas, total)`.
+
+        Lê só o resumo por alerta (`run_alerts`), então o custo não depende da
+        quantidade de instâncias do relatório.
+        """
+        where, params = "r.run_id = ?", [run_id]
+        if riskcode is not None:
+            where += " AND r.riskcode = ?"
+            params.append(str(riskcode))
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM run_alerts r WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""
+            SELECT c.alert_id, c.pluginid, c.alert_ref, c.description, c.solution, c.reference,
+                   c.cweid, c.wascid, r.name, r.riskcode, r.confidence, r.riskdesc, r.instances AS count
+            FROM run_alerts r JOIN alert_catalog c ON c.alert_id = r.alert_id
+            WHERE {where}
+            ORDER BY CAST(r.riskcode AS INTEGER) DESC, r.name, r.alert_id
+            LIMIT ? OFFSET ?
+            """,
+            (*params, int(limit), int(offset)),
+        ).fetchall()
+        alerts = [
+            {
+                "alert_id": row["alert_id"],
+                "pluginid": row["pluginid"],
+                "alertRef": row["alert_ref"],
+                "name": row["name"],
+                "riskcode": row["riskcode"],
+                "confidence": row["confidence"],
+                "riskdesc": row["riskdesc"],
+                "desc": row["description"],
+                "solution": row["solution"],
+                "reference": row["reference"],
+                "cweid": row["cweid"],
+                "wascid": row["wascid"],
+                "count": row["count"],
+            }
+            for row in rows
+        ]
+        return alerts, total
+
+    @_timed("read")
+    def run_instances(self, run_id, alert_id, offset=0, limit=100):
+        """Página de instâncias (URI, método, parâmetro) de um alerta numa execução."""
+        rows = self._conn().execute(
+            """
+            SELECT uri, method, param FROM findings
+            WHERE run_id = ? AND alert_id = ?
+            ORDER BY uri, method, param
+            LIMIT ? OFFSET ?
+            """,
+            (run_id, alert_id, int(limit), int(offset)),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _to_finding(row):
+        return {key: row[key] for key in ("pluginid", "alertRef", "name", "riskcode", "uri", "method", "param")}
+
+    @_timed("read")
+    def diff(self, base_run_id, head_run_id):
+        """
+        Compara duas execuções: achados novos (só em `head`), corrigidos (só em
+        `base`) e persistentes. Cada achado é procurado na outra execução pela
+        chave primária de `findings`.
+        """
+        conn = self._conn()
+
+        def select(run_id, other_run_id, exists):
+            return [
+                self._to_finding(row) for row in conn.execute(
+                    f"""
+                    SELECT {FINDING_COLUMNS}
+                    FROM {FINDING_JOIN}
+                    WHERE f.run_id = ? AND {"" if exists else "NOT "}EXISTS (
+                        SELECT 1 FROM findings o
+                        WHERE o.run_id = ? AND o.alert_id = f.alert_id
+                          AND o.uri = f.uri AND o.method = f.method AND o.param = f.param
+                    )
+                    ORDER BY CAST(r.riskcode AS INTEGER) DESC, c.pluginid, f.uri
+                    """,
+                    (run_id, other_run_id),
+                )
+            ]
+
+        return {
+            "new": select(head_run_id, base_run_id, exists=False),
+            "fixed": select(base_run_id, head_run_id, exists=False),
+            "unchanged": select(head_run_id, base_run_id, exists=True),
+        }
+
+    @_timed("read")
+    def changes_since_last_run(self, url_executado, alerts, target=None, profile=None):
+        """
+        Diferença entre os alertas de um relatório ainda não gravado e a última
+        execução do mesmo alvo e perfil (padrão: `url_executado` e o perfil
+        padrão), para não comparar um scan "quick" com um "deep" nem caminhos
+        diferentes do host. Retorna None se não houver execução anterior.
+        """
+        last = self.last_run(target or url_executado, profile or DEFAULT_PROFILE)
+        if last is None:
+            return None
+        previous = [last]
+        conn = self._conn()
+        before = {
+            tuple(row[key] for key in FINDING_KEY): self._to_finding(row)
+            for row in conn.execute(
+                f"""
+                SELECT {FINDING_COLUMNS}
+                FROM {FINDING_JOIN}
+                WHERE f.run_id = ?
+                """,
+                (previous[0]["run_id"],),
+            )
+        }
+        current = {}
+        for alert in alerts:
+            for instance in alert.get("instances", []):
+                finding = {
+                    "pluginid": str(alert.get("pluginid", "")),
+                    "alertRef": str(alert.get("alertRef", alert.get("pluginid", ""))),
+                    "name": alert.get("name", alert.get("alert", "")),
+                    "riskcode": str(alert.get("riskcode", "0")),
+                    "uri": instance.get("uri", ""),
+                    "method": instance.get("method", ""),
+                    "param": instance.get("param", ""),
+                }
+                current[tuple(finding[key] for key in FINDING_KEY)] = finding
+        return {
+            "base": previous[0],
+            "new": [f for key, f in current.items() if key not in before],
+            "fixed": [f for key, f in before.items() if key not in current],
+            "unchanged": [f for key, f in current.items() if key in before],
+        }
+
+    @_timed("read")
+    def get(self, url_executado):
+        row = self._conn().execute("SELECT * FROM reports WHERE url_executado = ?", (url_executado,)).fetchone()
+        return self._to_record(row) if row else None
+
+    @_timed("read")
+    def get_by_html(self, caminho_html):
+        row = self._conn().execute("SELECT * FROM reports WHERE caminho_html = ?", (caminho_html,)).fetchone()
+        return self._to_record(row) if row else None
+
+    @_timed("write")
+    def delete(self, url_executado):
+        """Remove o relatório, o histórico de execuções e as entradas de cache da URL. Retorna False se ele não existir."""
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM scan_results WHERE caminho_html IN "
+                "(SELECT caminho_html FROM reports WHERE url_executado = ?)",
+                (url_executado,),
+            )
+            for row in conn.execute(
+                "SELECT run_id FROM runs WHERE url_executado = ?", (url_executado,)
+            ).fetchall():
+                self._delete_run(conn, row["run_id"])
+            cursor = conn.execute("DELETE FROM reports WHERE url_executado = ?", (url_executado,))
+            if cursor.rowcount:
+                self._touch(conn)
+        return cursor.rowcount > 0
+
+    @_timed("write")
+    def record_scan_result(self, target, profile, caminho_html, finished_at=None):
+        """
+        Registra o relatório mais recente de um alvo normalizado + perfil de scan.
+        Outros resultados que apontavam para o mesmo arquivo (sobrescrito agora) são removidos.
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM scan_results WHERE caminho_html = ? AND NOT (target = ? AND profile = ?)",
+                (caminho_html, target, profile),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO scan_results (target, profile, finished_at, caminho_html) VALUES (?, ?, ?, ?)",
+                (target, profile, finished_at or time.time(), caminho_html),
+            )
+
+    @_timed("read")
+    def cached_result(self, target, profile, max_age):
+        """Último resultado do alvo/perfil com no máximo `max_age` segundos, ou None."""
+        row = self._conn().execute(
+            "SELECT * FROM scan_results WHERE target = ? AND profile = ? AND finished_at >= ?",
+            (target, profile, time.time() - max_age),
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "target": row["target"],
+            "profile": row["profile"],
+            "finished_at": row["finished_at"],
+            "caminho_html": row["caminho_html"],
+        }
+
+    def list(self, limit=None, offset=0, url=None, since=None, until=None, min_risks=None):
+        """
+        Lista relatórios, mais recentes primeiro.
+
+        :param url: trecho contido em `url_executado`
+        :param since/until: limites (inclusivos) de `data_execucao`, formato "YYYY-MM-DD HH:MM:SS"
+        :param min_risks: mínimo por coluna de risco, ex.: {"alto": 1}
+        """
+        records, _ = self.page(limit=limit, offset=offset, url=url, since=since, until=until,
+                               min_risks=min_risks)
+        return records
+
+    @_timed("read")
+    def page(self, limit=None, cursor=None, offset=0, sort="data_execucao", order="desc",
+             url=None, since=None, until=None, min_risks=None):
+        """
+        Página de relatórios com paginação por cursor (keyset).
+
+        Retorna `(registros, próximo_cursor)`; o cursor é None na última página.
+        Com `cursor` a consulta continua do último item entregue pelo índice
+        `(sort, url_executado)`, sem `OFFSET`.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Coluna de ordenação inválida: {sort}")
+        if order not in ("asc", "desc"):
+            raise ValueError(f"Ordem inválida: {order}")
+        if limit is not None and int(limit) < 1:
+            raise ValueError(f"limit deve ser >= 1: {limit}")
+        if offset and int(offset) < 0:
+            raise ValueError(f"offset deve ser >= 0: {offset}")
+
+        where, params = [], []
+        if url:
+            where.append("url_executado LIKE ? ESCAPE '\\'")
+            escaped = url.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if since:
+            where.append("data_execucao >= ?")
+            params.append(since)
+        if until:
+            where.append("data_execucao <= ?")
+            params.append(until)
+        for col, minimum in (min_risks or {}).items():
+            if col not in RISK_COLUMNS:
+                raise ValueError(f"Coluna de risco inválida: {col}")
+            where.append(f"{col} >= ?")
+            params.append(int(minimum))
+        if cursor:
+            last_value, last_url = self._decode_cursor(cursor)
+            comparison = "<" if order == "desc" else ">"
+            if sort == "url_executado":
+                where.append(f"url_executado {comparison} ?")
+                params.append(last_url)
+            else:
+                where.append(f"({sort}, url_executado) {comparison} (?, ?)")
+                params.extend([last_value, last_url])
+
+        sql = "SELECT * FROM reports"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        direction = order.upper()
+        if sort == "url_executado":
+            sql += f" ORDER BY url_executado {direction}"
+        else:
+            sql += f" ORDER BY {sort} {direction}, url_executado {direction}"
+        if limit is not None or (offset and not cursor):
+            # LIMIT -1: só offset, sem limite de linhas
+            sql += " LIMIT ?"
+            params.append(int(limit) + 1 if limit is not None else -1)
+            if offset and not cursor:
+                sql += " OFFSET ?"
+                params.append(int(offset))
+
+        rows = self._conn().execute(sql, params).fetchall()
+        next_cursor = None
+        if limit is not None and len(rows) > int(limit):
+            rows = rows[:int(limit)]
+            last = rows[-1]
+            next_cursor = self._encode_cursor(last[sort], last["url_executado"])
+        return [self._to_record(row) for row in rows], next_cursor
+
+    @staticmethod
+    def _encode_cursor(value, url_executado):
+        raw = json.dumps([value, url_executado], separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            value, url_executado = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Cursor inválido: {cursor}") from e
+        return value, url_executado
+
+    @_timed("read")
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+
@@ -0,0 +1,150 @@
+import gzip
+import hashlib
+import os
+import re
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # brotli é opcional: sem ele, só a variante gzip é gravada
+    brotli = None
+
+ASSETS_DIRNAME = "assets"
+BROTLI_QUALITY = 9
+GZIP_LEVEL = 9
+
+# Sufixo de cada variante comprimida, na ordem de preferência ao servir
+ENCODING_SUFFIXES = (("br", ".br"), ("gzip", ".gz"))
+
+INLINE_STYLE_PATTERN = re.compile(r'<style>(.*?)</style>', re.S)
+INLINE_SCRIPT_PATTERN = re.compile(r'<script(?:\s+defer)?\s*>(.*?)</script>', re.S)
+ASSET_TAG_PATTERN = re.compile(
+    r'<link rel="stylesheet" href="\.\./assets/([0-9a-f]+\.css)" data-report-asset>'
+    r'|<script src="\.\./assets/([0-9a-f]+\.js)" defer data-report-asset></script>'
+)
+
+
+def write_report(chunks, path):
+    """
+    Grava o conteúdo (pedaços de texto) já comprimido: `path.gz` e, com brotli
+    instalado, `path.br`. Cada variante é escrita num temporário e movida no
+    final. Uma versão sem compressão antiga de `path` é removida.
+    Retorna o tamanho do conteúdo sem compressão, em bytes.
+    """
+    path = Path(path)
+    gz_tmp = path.with_name(path.name + '.gz.tmp')
+    br_tmp = path.with_name(path.name + '.br.tmp')
+    compressor = brotli.Compressor(quality=BROTLI_QUALITY) if brotli else None
+    size = 0
+
+    with open(gz_tmp, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as gz:
+        br_file = open(br_tmp, 'wb') if compressor else None
+        try:
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                size += len(data)
+                gz.write(data)
+                if compressor:
+                    br_file.write(compressor.process(data))
+            if compressor:
+                br_file.write(compressor.finish())
+        finally:
+            if br_file:
+                br_file.close()
+
+    os.replace(gz_tmp, path.with_name(path.name + '.gz'))
+    if compressor:
+        os.replace(br_tmp, path.with_name(path.name + '.br'))
+    if path.exists():
+        path.unlink()
+    return size
+
+
+def _variants(path):
+    """(content-encoding, arquivo) das variantes existentes, na ordem de preferência."""
+    path = Path(path)
+    found = [
+        (encoding, path.with_name(path.name + suffix))
+        for encoding, suffix in ENCODING_SUFFIXES
+        if path.with_name(path.name + suffix).exists()
+    ]
+    if path.exists():
+        found.append((None, path))
+    return found
+
+
+def report_exists(path):
+    return bool(_variants(path))
+
+
+def select_variant(path, accepted_encodings):
+    """
+    Variante que pode ser enviada como está: a comprimida preferida entre as
+    aceitas pelo cliente ou o arquivo sem compressão (relatórios antigos).
+    Retorna (content-encoding ou None, arquivo), ou None se for preciso descomprimir.
+    """
+    for encoding, file_path in _variants(path):
+        if encoding is None or encoding in accepted_encodings:
+            return encoding, file_path
+    return None
+
+
+def read_report(path):
+    """Conteúdo sem compressão (bytes), ou None se o relatório não existir."""
+    for encoding, file_path in reversed(_variants(path)):
+        if encoding is None:
+            return file_path.read_bytes()
+        if encoding == 'gzip':
+            with gzip.open(file_path, 'rb') as f:
+                return f.read()
+        if brotli:
+            return brotli.decompress(file_path.read_bytes())
+    return None
+
+
+def delete_report(path):
+    """Remove todas as variantes. Retorna False se não havia nenhuma."""
+    variants = _variants(path)
+    for _, file_path in variants:
+        file_path.unlink()
+    return bool(variants)
+
+
+def store_asset(content, extension, assets_dir):
+    """Grava um asset compartilhado com nome pelo hash do conteúdo e retorna o nome."""
+    name = f"{hashlib.sha256(content.encode('utf-8')).hexdigest()[:20]}.{extension}"
+    path = Path(assets_dir) / name
+    if not report_exists(path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_report([content], path)
+    return name
+
+
+def extract_assets(template_html, assets_dir):
+    """
+    Move o CSS e o JS inline do template para assets compartilhados entre os
+    relatórios, trocando os blocos por `<link>`/`<script src>` relativos a
+    `/api/reports/html/`.
+    """
+    def style(match):
+        name = store_asset(match.group(1), 'css', assets_dir)
+        return f'<link rel="stylesheet" href="../assets/{name}" data-report-asset>'
+
+    def script(match):
+        name = store_asset(match.group(1), 'js', assets_dir)
+        return f'<script src="../assets/{name}" defer data-report-asset></script>'
+
+    return INLINE_SCRIPT_PATTERN.sub(script, INLINE_STYLE_PATTERN.sub(style, template_html))
+
+
+def inline_assets(report_html, assets_dir):
+    """Inverso de `extract_assets`: gera um HTML autocontido (ex.: para download)."""
+    def replace(match):
+        css_name, js_name = match.groups()
+        content = read_report(Path(assets_dir) / (css_name or js_name))
+        if content is None:
+            return match.group(0)
+        text = content.decode('utf-8')
+        return f'<style>{text}</style>' if css_name else f'<script defer>{text}</script>'
+
+    return ASSET_TAG_PATTERN.sub(replace, report_html)
@@ -0,0 +1,121 @@
+import os
+import secrets
+import time
+
+from services import json_codec
+from services.sqlite_store import SQLiteStore
+
+DB_FILENAME = "scan_history.db"
+HISTORY_PER_URL = int(os.getenv("SCAN_HISTORY_PER_URL", "50"))
+
+# Colunas próprias; os demais campos do scan vão para `data` (JSON)
+COLUMNS = ("url", "status", "profile", "batch_id", "queued_at", "started_at", "finished_at",
+           "error", "caminho_html")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scans (
+    scan_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    profile TEXT,
+    batch_id TEXT,
+    queued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    caminho_html TEXT,
+    data TEXT NOT NULL DEFAULT '{}',
+    log_count INTEGER NOT NULL DEFAULT 0,
+    logs TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_scans_url ON scans (url, queued_at DESC);
+"""
+
+
+def new_scan_id():
+    return secrets.token_hex(8)
+
+
+class ScanHistory(SQLiteStore):
+    """
+    Histórico durável dos scans em `REPORTS_DIR/scan_history.db`, por `scan_id`.
+
+    Sobrevive a reinícios do pod e à remoção do estado em memória: cada scan
+    guarda status, datas, erro, relatório e, ao terminar, o final do log.
+    Por URL ficam os `SCAN_HISTORY_PER_URL` scans mais recentes.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, reports_dir, per_url=None):
+        self.per_url = per_url or HISTORY_PER_URL
+        super().__init__(os.path.join(reports_dir, DB_FILENAME))
+
+    @staticmethod
+    def _split(fields):
+        columns = {k: v for k, v in fields.items() if k in COLUMNS}
+        extra = {k: v for k, v in fields.items() if k not in COLUMNS and k != "scan_id"}
+        return columns, extra
+
+    def record(self, scan_id, url, **fields):
+        """Registra um scan recém-enfileirado."""
+        columns, extra = self._split({"status": "queued", "queued_at": time.time(), **fields})
+        columns["url"] = url
+        names = ["scan_id", *columns, "data"]
+        with self._transaction() as conn:
+            conn.execute(
+                f"INSERT INTO scans ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                (scan_id, *columns.values(), json_codec.dumps(extra, default=str)),
+            )
+            conn.execute(
+                """
+                DELETE FROM scans WHERE url = ? AND scan_id NOT IN (
+                    SELECT scan_id FROM scans WHERE url = ? ORDER BY queued_at DESC LIMIT ?
+                )
+                """,
+                (url, url, self.per_url),
+            )
+
+    def update(self, scan_id, logs=None, log_count=None, **fields):
+        """Atualiza campos do scan; `logs` (final do log) e `log_count` são gravados ao terminar."""
+        columns, extra = self._split(fields)
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()
+            if row is None:
+                return False
+            assignments, params = [f"{name} = ?" for name in columns], list(columns.values())
+            if extra:
+                data = json_codec.loads(row["data"])
+                data.update(extra)
+                assignments.append("data = ?")
+                params.append(json_codec.dumps(data, default=str))
+            if logs is not None:
+                assignments += ["logs = ?", "log_count = ?"]
+                params += [json_codec.dumps(list(logs)), len(logs) if log_count is None else log_count]
+            if assignments:
+                conn.execute(f"UPDATE scans SET {', '.join(assignments)} WHERE scan_id = ?", (*params, scan_id))
+            return True
+
+    @staticmethod
+    def _to_scan(row, with_logs=False):
+        scan = {"scan_id": row["scan_id"], **json_codec.loads(row["data"])}
+        scan.update({name: row[name] for name in COLUMNS})
+        scan["log_count"] = row["log_count"]
+        if with_logs:
+            scan["logs"] = json_codec.loads(row["logs"]) if row["logs"] else []
+        return scan
+
+    def get(self, scan_id, with_logs=True):
+        row = self._conn().execute("SELECT * FROM scans WHERE scan_id = ?", (scan_id,)).fetchone()
+        return self._to_scan(row, with_logs) if row else None
+
+    def for_url(self, url, limit=20):
+        """Scans da URL, mais recentes primeiro (sem os logs)."""
+        rows = self._conn().execute(
+            "SELECT * FROM scans WHERE url = ? ORDER BY queued_at DESC LIMIT ?", (url, limit)
+        )
+        return [self._to_scan(row) for row in rows]
+
+    def latest(self, url):
+        scans = self.for_url(url, limit=1)
+        return scans[0] if scans else None
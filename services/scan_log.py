@@ -0,0 +1,105 @@
+import os
+import threading
+from collections import deque
+
+MAX_LOG_LINES = int(os.getenv("SCAN_LOG_MAX_LINES", "1000"))
+
+
+class ScanLog:
+    """
+    Log e progresso de um scan, com espera por novidades.
+
+    Leitores guardam o offset da última linha recebida e pedem só o que veio
+    depois dele, em vez de receber o log inteiro a cada consulta.
+    As linhas ficam num buffer circular de `max_lines` (padrão
+    `SCAN_LOG_MAX_LINES`); os offsets continuam absolutos, e quem pede um
+    offset já descartado recebe a partir da linha mais antiga mantida.
+    """
+
+    def __init__(self, max_lines=None):
+        self._cond = threading.Condition()
+        self._lines = deque(maxlen=max_lines or MAX_LOG_LINES)
+        self._dropped = 0
+        self._progress = {}
+        self._phase = None
+        self._version = 0
+        self._closed = False
+
+    def append(self, line):
+        with self._cond:
+            if len(self._lines) == self._lines.maxlen:
+                self._dropped += 1
+            self._lines.append(line)
+            self._changed()
+
+    def _total(self):
+        return self._dropped + len(self._lines)
+
+    def _tail(self, offset):
+        """(linhas a partir do offset absoluto, offset efetivo)."""
+        offset = max(self._dropped, min(offset, self._total()))
+        return list(self._lines)[offset - self._dropped:], offset
+
+    def set_progress(self, phase, percent):
+        with self._cond:
+            self._phase = phase
+            self._progress[phase] = percent
+            self._changed()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._changed()
+
+    def _changed(self):
+        self._version += 1
+        self._cond.notify_all()
+
+    @property
+    def closed(self):
+        with self._cond:
+            return self._closed
+
+    def summary(self):
+        with self._cond:
+            return {
+                "phase": self._phase,
+                "progress": dict(self._progress),
+                "log_count": self._total(),
+                "last_log": self._lines[-1] if self._lines else None,
+            }
+
+    def read(self, offset=0):
+        """Linhas a partir de `offset` e o offset seguinte."""
+        with self._cond:
+            lines, _ = self._tail(offset)
+            return lines, self._total()
+
+    def wait(self, offset, version=None, timeout=None):
+        """
+        Espera até haver linhas após `offset`, mudança de progresso desde `version`
+        ou o fechamento do log. Retorna a versão atual.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: (
+                    self._closed
+                    or self._total() > offset
+                    or (version is not None and self._version != version)
+                ),
+                timeout=timeout,
+            )
+            return self._version
+
+    def snapshot(self, offset=0):
+        """(linhas após `offset`, próximo offset, progresso, fase, versão, fechado) de forma atômica."""
+        with self._cond:
+            lines, _ = self._tail(offset)
+            return (
+                lines,
+                self._total(),
+                dict(self._progress),
+                self._phase,
+                self._version,
+                self._closed,
+            )
@@ -0,0 +1,429 @@
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from services import json_codec
+from services.scan_log import MAX_LOG_LINES, ScanLog
+from services.sqlite_store import SQLiteStore
+
+ACTIVE_STATUSES = ("queued", "started", "running")
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+# Scans finalizados saem do estado após o TTL; o histórico durável fica em `services/scan_history.py`
+FINISHED_TTL = float(os.getenv("SCAN_STATE_TTL", "3600"))
+MAX_FINISHED = int(os.getenv("SCAN_STATE_MAX_FINISHED", "200"))
+
+
+def create_scan_state_store(backend, reports_dir):
+    """
+    Cria o backend de estado dos scans.
+
+    - "memory": estado no próprio processo (um único worker).
+    - "sqlite": estado compartilhado em `REPORTS_DIR/scan_state.db`, visível para
+      todos os workers do gunicorn e réplicas que montam o mesmo volume.
+    """
+    if backend == "memory":
+        return MemoryScanStateStore()
+    if backend == "sqlite":
+        return SQLiteScanStateStore(os.path.join(reports_dir, "scan_state.db"))
+    raise ValueError(f"Backend de estado desconhecido: {backend}")
+
+
+class MemoryScanStateStore:
+    """
+    Estado dos scans em memória, protegido por um lock do processo.
+
+    Scans finalizados saem após `ttl` segundos sem consulta e, acima de
+    `max_finished`, os menos consultados recentemente saem primeiro (LRU).
+    """
+
+    def __init__(self, ttl=None, max_finished=None):
+        self.ttl = FINISHED_TTL if ttl is None else ttl
+        self.max_finished = MAX_FINISHED if max_finished is None else max_finished
+        self._lock = threading.Lock()
+        self._scans = {}
+        self._finished = OrderedDict()  # url -> último acesso, do mais antigo para o mais recente
+
+    def _touch(self, url):
+        self._finished[url] = time.monotonic()
+        self._finished.move_to_end(url)
+
+    def _track(self, url, record):
+        if record.get("status") in FINISHED_STATUSES:
+            self._touch(url)
+        else:
+            self._finished.pop(url, None)
+
+    def _evict(self):
+        expires = time.monotonic() - self.ttl
+        while self._finished:
+            url, finished_at = next(iter(self._finished.items()))
+            if finished_at >= expires and len(self._finished) <= self.max_finished:
+                break
+            del self._finished[url]
+            self._scans.pop(url, None)
+
+    def try_start(self, url, record):
+        """Registra o scan se não houver outro ativo para a URL. Retorna False se já houver."""
+        with self._lock:
+            self._evict()
+            current = self._scans.get(url)
+            if current and current[0].get("status") in ACTIVE_STATUSES:
+                return False
+            self._scans[url] = ({**record, "queued_at": time.time()}, ScanLog())
+            self._finished.pop(url, None)
+            return True
+
+    def get(self, url):
+        with self._lock:
+            self._evict()
+            current = self._scans.get(url)
+            if current is None:
+                return None
+            if url in self._finished:
+                self._touch(url)
+            record, scan_log = current
+            summary = dict(record)
+            if summary.get("status") == "queued":
+                summary["queue_position"] = self._queue_position(record)
+        summary.update(scan_log.summary())
+        return summary
+
+    def _queue_position(self, record):
+        key = (-record.get("priority", 0), record["queued_at"])
+        return 1 + sum(
+            1 for other, _ in self._scans.values()
+            if other.get("status") == "queued" and (-other.get("priority", 0), other["queued_at"]) < key
+        )
+
+    def update(self, url, /, **fields):
+        with self._lock:
+            current = self._scans.get(url)
+            if current is None:
+                return False
+            current[0].update(fields)
+            self._track(url, current[0])
+            self._evict()
+            return True
+
+    def transition(self, url, from_statuses, /, scan_id=None, **fields):
+        """
+        Atualiza o registro só se o status atual estiver em `from_statuses`
+        (e, com `scan_id`, só se o registro for desse scan).
+        """
+        with self._lock:
+            current = self._scans.get(url)
+            if current is None or current[0].get("status") not in from_statuses:
+                return False
+            if scan_id is not None and current[0].get("scan_id") != scan_id:
+                return False
+            current[0].update(fields)
+            self._track(url, current[0])
+            self._evict()
+            return True
+
+    def _log(self, url):
+        with self._lock:
+            current = self._scans.get(url)
+        return current[1] if current else None
+
+    def append_log(self, url, line):
+        scan_log = self._log(url)
+        if scan_log:
+            scan_log.append(line)
+
+    def set_progress(self, url, phase, percent):
+        scan_log = self._log(url)
+        if scan_log:
+            scan_log.set_progress(phase, percent)
+
+    def close_log(self, url):
+        scan_log = self._log(url)
+        if scan_log:
+            scan_log.close()
+
+    def read_logs(self, url, offset=0):
+        scan_log = self._log(url)
+        return scan_log.read(offset) if scan_log else ([], 0)
+
+    def running_elsewhere(self):
+        """Em memória o estado é de um único processo: nunca há scans de outros processos."""
+        return 0
+
+    def snapshot(self, url, offset=0):
+        """(linhas após `offset`, próximo offset, progresso, fase, versão, fechado)."""
+        scan_log = self._log(url)
+        if scan_log is None:
+            return [], offset, {}, None, None, True
+        return scan_log.snapshot(offset)
+
+    def wait(self, url, offset, version=None, timeout=None):
+        scan_log = self._log(url)
+        return scan_log.wait(offset, version, timeout) if scan_log else version
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scan_state (
+    url TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    queued_at REAL NOT NULL,
+    owner TEXT NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    phase TEXT,
+    progress TEXT NOT NULL DEFAULT '{}',
+    log_count INTEGER NOT NULL DEFAULT 0,
+    log_closed INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_scan_state_queue ON scan_state (status, priority, queued_at);
+CREATE TABLE IF NOT EXISTS scan_logs (
+    url TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    line TEXT NOT NULL,
+    PRIMARY KEY (url, seq)
+);
+"""
+
+
+class SQLiteScanStateStore(SQLiteStore):
+    """
+    Estado dos scans em SQLite (WAL), compartilhado entre processos.
+
+    `try_start` é atômico (`BEGIN IMMEDIATE`), então só um worker consegue
+    iniciar o scan de uma URL. Cada processo renova o `heartbeat_at` dos seus
+    scans ativos; um scan ativo sem heartbeat há mais de `stale_after` segundos
+    (processo morto) não bloqueia um novo scan da mesma URL.
+    """
+
+    schema = SCHEMA
+
+    def __init__(self, db_path, stale_after=120.0, poll_interval=0.5, ttl=None, max_log_lines=None):
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.ttl = FINISHED_TTL if ttl is None else ttl
+        self.max_log_lines = max_log_lines or MAX_LOG_LINES
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.logger = logging.getLogger('SQLiteScanStateStore')
+        self._heartbeat_thread = None
+        super().__init__(db_path)
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat_thread is None or not self._heartbeat_thread.is_alive():
+            self._heartbeat_thread = threading.Thread(
+                target=self._heartbeat_loop, name="scan-state-heartbeat", daemon=True
+            )
+            self._heartbeat_thread.start()
+
+    def _heartbeat_loop(self):
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        while True:
+            time.sleep(self.stale_after / 4)
+            try:
+                with self._transaction() as conn:
+                    conn.execute(
+                        f"UPDATE scan_state SET heartbeat_at = ? WHERE owner = ? AND status IN ({placeholders})",
+                        (time.time(), self.owner, *ACTIVE_STATUSES),
+                    )
+            except sqlite3.Error as e:
+                self.logger.warning(f"Falha ao renovar heartbeat: {e}")
+
+    def try_start(self, url, record):
+        """Registra o scan se não houver outro ativo para a URL. Retorna False se já houver."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT status, heartbeat_at, version FROM scan_state WHERE url = ?", (url,)
+            ).fetchone()
+            if row and row["status"] in ACTIVE_STATUSES and now - row["heartbeat_at"] < self.stale_after:
+                return False
+            self._evict(conn, now)
+            conn.execute("DELETE FROM scan_logs WHERE url = ?", (url,))
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO scan_state
+                    (url, status, priority, queued_at, owner, heartbeat_at, version, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    url,
+                    record.get("status", "queued"),
+                    int(record.get("priority", 0)),
+                    now,
+                    self.owner,
+                    now,
+                    (row["version"] if row else 0) + 1,
+                    json_codec.dumps(record, default=str),
+                ),
+            )
+        self._ensure_heartbeat()
+        return True
+
+    def _evict(self, conn, now):
+        """Remove scans finalizados (e seus logs) sem atualização há mais de `ttl` segundos."""
+        placeholders = ",".join("?" * len(FINISHED_STATUSES))
+        expired = f"SELECT url FROM scan_state WHERE status IN ({placeholders}) AND heartbeat_at < ?"
+        params = (*FINISHED_STATUSES, now - self.ttl)
+        conn.execute(f"DELETE FROM scan_logs WHERE url IN ({expired})", params)
+        conn.execute(f"DELETE FROM scan_state WHERE url IN ({expired})", params)
+
+    def running_elsewhere(self):
+        """
+        Quantos scans de outros processos já estão usando o ZAP (`started`/`running`
+        com heartbeat recente). Scans `queued` ainda não tocaram no daemon.
+        """
+        row = self._conn().execute(
+            """
+            SELECT COUNT(*) FROM scan_state
+            WHERE status IN ('started', 'running') AND owner != ? AND heartbeat_at >= ?
+            """,
+            (self.owner, time.time() - self.stale_after),
+        ).fetchone()
+        return row[0]
+
+    def get(self, url):
+        conn = self._conn()
+        row = conn.execute("SELECT * FROM scan_state WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        summary = json_codec.loads(row["data"])
+        summary["status"] = row["status"]
+        summary["phase"] = row["phase"]
+        summary["progress"] = json_codec.loads(row["progress"])
+        summary["log_count"] = row["log_count"]
+        last = conn.execute(
+            "SELECT line FROM scan_logs WHERE url = ? AND seq = ?", (url, row["log_count"] - 1)
+        ).fetchone()
+        summary["last_log"] = last["line"] if last else None
+        if row["status"] == "queued":
+            summary["queue_position"] = 1 + conn.execute(
+                """
+                SELECT COUNT(*) FROM scan_state
+                WHERE status = 'queued'
+                  AND (priority > ? OR (priority = ? AND queued_at < ?))
+                """,
+                (row["priority"], row["priority"], row["queued_at"]),
+            ).fetchone()[0]
+        return summary
+
+    def _update_data(self, conn, url, fields):
+        row = conn.execute("SELECT data FROM scan_state WHERE url = ?", (url,)).fetchone()
+        data = json_codec.loads(row["data"])
+        data.update(fields)
+        status = fields.get("status", data.get("status"))
+        conn.execute(
+            "UPDATE scan_state SET data = ?, status = ?, heartbeat_at = ?, version = version + 1 WHERE url = ?",
+            (json_codec.dumps(data, default=str), status, time.time(), url),
+        )
+
+    def update(self, url, /, **fields):
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM scan_state WHERE url = ?", (url,)).fetchone() is None:
+                return False
+            self._update_data(conn, url, fields)
+            return True
+
+    def transition(self, url, from_statuses, /, scan_id=None, **fields):
+        """
+        Atualiza o registro só se o status atual estiver em `from_statuses`
+        (e, com `scan_id`, só se o registro for desse scan).
+        """
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status, data FROM scan_state WHERE url = ?", (url,)).fetchone()
+            if row is None or row["status"] not in from_statuses:
+                return False
+            if scan_id is not None and json_codec.loads(row["data"]).get("scan_id") != scan_id:
+                return False
+            self._update_data(conn, url, fields)
+            return True
+
+    def append_log(self, url, line):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT log_count FROM scan_state WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return
+            conn.execute(
+                "INSERT INTO scan_logs (url, seq, line) VALUES (?, ?, ?)", (url, row["log_count"], line)
+            )
+            # buffer circular: mantém só as últimas `max_log_lines` linhas
+            conn.execute(
+                "DELETE FROM scan_logs WHERE url = ? AND seq = ?", (url, row["log_count"] - self.max_log_lines)
+            )
+            conn.execute(
+                """
+                UPDATE scan_state
+                SET log_count = log_count + 1, version = version + 1, heartbeat_at = ?
+                WHERE url = ?
+                """,
+                (time.time(), url),
+            )
+
+    def set_progress(self, url, phase, percent):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT progress FROM scan_state WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return
+            progress = json_codec.loads(row["progress"])
+            progress[phase] = percent
+            conn.execute(
+                "UPDATE scan_state SET phase = ?, progress = ?, version = version + 1 WHERE url = ?",
+                (phase, json_codec.dumps(progress), url),
+            )
+
+    def close_log(self, url):
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE scan_state SET log_closed = 1, version = version + 1 WHERE url = ?", (url,)
+            )
+
+    def read_logs(self, url, offset=0):
+        lines, next_offset, *_ = self.snapshot(url, offset)
+        return lines, next_offset
+
+    def snapshot(self, url, offset=0):
+        """(linhas após `offset`, próximo offset, progresso, fase, versão, fechado)."""
+        with self._transaction(immediate=False) as conn:
+            row = conn.execute(
+                "SELECT version, phase, progress, log_count, log_closed FROM scan_state WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return [], offset, {}, None, None, True
+            offset = max(0, min(offset, row["log_count"]))
+            lines = [
+                r["line"] for r in conn.execute(
+                    "SELECT line FROM scan_logs WHERE url = ? AND seq >= ? ORDER BY seq", (url, offset)
+                )
+            ]
+        return (
+            lines,
+            row["log_count"],
+            json_codec.loads(row["progress"]),
+            row["phase"],
+            row["version"],
+            bool(row["log_closed"]),
+        )
+
+    def wait(self, url, offset, version=None, timeout=None):
+        """Consulta periodicamente até haver novidade (não há notificação entre processos)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            row = self._conn().execute(
+                "SELECT version, log_count, log_closed FROM scan_state WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return version
+            if (row["log_closed"] or row["log_count"] > offset
+                    or (version is not None and row["version"] != version)):
+                return row["version"]
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return row["version"]
+                time.sleep(min(self.poll_interval, remaining))
+            else:
+                time.sleep(self.poll_interval)
+
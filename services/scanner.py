@@ -1,92 +1,366 @@
-import subprocess
-import json
+import time
 from pathlib import Path
 from dataclasses import dataclass
 import os
+import re
 import logging
-from services import notifier
+from services import json_codec, notifier
+from services.baseline import fingerprint_message, get_baseline_store
+from services.batch import scope_digest
+from services.metrics import SCAN_PHASE
+from services.poller import default_poller
+from services.profiles import DEFAULT_PROFILE, get_profile
+from services.render import render_html_report
+from services.report_storage import report_exists
+from services.supervisor import run_supervised
+from services.zap_client import ZapApiError
+from services.zap_pool import ZapPool
+from services.zap_report import build_site_report
+
+PASSIVE_SCAN_POLL_INTERVAL = 1.0
+
+SCRIPT_PROGRESS_PATTERN = re.compile(r'^Progresso( do spider)?: (\d+)%')
 
 @dataclass
 class ScanResult:
     scan_id: str
     report_json: dict
     report_html: str
+    wall_time: float = None
+    cpu_time: float = None
+    peak_rss_kb: int = None
     
 class ZapScanner:
-    def __init__(self, script_path, reports_dir, template_dir, template_file):
+    def __init__(self, script_path, reports_dir, template_dir, template_file, zap_client=None, mode=None, poller=None, zap_pool=None, baseline_store=None):
         self.script_path = Path(script_path)
         self.reports_dir = Path(reports_dir)
         self.template_dir = Path(template_dir)
         self.template_file = template_file
+        self.mode = mode or os.getenv("ZAP_SCAN_MODE", "native")
+        self.zap = zap_client
+        self.zap_pool = zap_pool
+        self.poller = poller or default_poller
+        self.baseline_store = baseline_store
         self.logger = logging.getLogger('ZapScanner')
         
-        if not self.script_path.exists(): 
+        if self.mode == "script" and not self.script_path.exists(): 
             raise FileNotFoundError(f"Script not found: {script_path}")
+        if self.mode == "native" and self.zap is None and self.zap_pool is None:
+            self.zap_pool = ZapPool.from_env()
         
         self.reports_dir.mkdir(parents=True, exist_ok=True)
 
-    def _generate_safe_filename(self, url):
-        """Gera um nome seguro a partir da URL (centralizado no Python)"""
-        import re
+    def _generate_safe_filename(self, url, profile=None, scope=None):
+        """
+        Gera um nome seguro a partir da URL (centralizado no Python). Perfis
+        diferentes do padrão e scans agrupados ganham um sufixo, para que o
+        relatório de um não sobrescreva o de outro (o cache de resultados é por
+        alvo e perfil).
+        """
         safe_name = re.sub(r'^https?://', '', url)
-        safe_name = re.sub(r'[^a-zA-Z0-9-]', '_', safe_name)
-        return safe_name[:50]
+        safe_name = re.sub(r'[^a-zA-Z0-9-]', '_', safe_name)[:50]
+        if profile is not None and profile.name != DEFAULT_PROFILE:
+            safe_name += f"__{profile.name}"
+        if scope and len(scope) > 1:
+            safe_name += f"__scope-{scope_digest(scope)}"
+        return safe_name
+
+
+    def execute(self, target_url, log_callback=None, progress_callback=None, incremental=False, profile=None,
+                scope=None):
+        """
+        Executa o scan. `log_callback(linha)` recebe cada linha de log e
+        `progress_callback(fase, percentual)` o progresso de "spider" e "ascan".
+        Com `incremental=True` (só no modo nativo) o scan ativo cobre apenas as
+        URLs novas ou alteradas desde o último scan do alvo.
+        `profile` é o nome de um perfil de `services.profiles` (padrão "standard").
+        `scope` (só no modo nativo) são várias URLs do mesmo host de `target_url`
+        varridas num único contexto, com um só spider e um só relatório.
+        """
+        profile = get_profile(profile)
+        if self.mode == "script":
+            if incremental:
+                self.logger.warning("Scan incremental não suportado no modo script; executando scan completo")
+            if profile.name != DEFAULT_PROFILE:
+                self.logger.warning(f"Modo script aplica apenas o prazo do perfil {profile.name}")
+            if scope and len(scope) > 1:
+                self.logger.warning(f"Modo script não agrupa URLs; executando scan de {target_url}")
+            return self._execute_script(target_url, log_callback, progress_callback, profile)
+        return self._execute_native(target_url, log_callback, progress_callback, incremental, profile, scope)
+
+    def _execute_native(self, target_url, log_callback=None, progress_callback=None, incremental=False, profile=None,
+                        scope=None):
+        """Executa o scan pela API do ZAP no próprio processo, sem curl/jq."""
+        def log(line):
+            if log_callback:
+                log_callback(line)
+            self.logger.info(line)
+
+        def progress(phase, percent):
+            if progress_callback:
+                progress_callback(phase, percent)
+
+        safe_name = self._generate_safe_filename(target_url, profile, scope)
+        json_path = self.reports_dir / f'{safe_name}.json'
+        html_path = self.reports_dir / f'{safe_name}.html'
+        template_path = self.template_dir / self.template_file
+        started = time.monotonic()
+        cpu_started = time.thread_time()
+        deadline = started + profile.timeout
+
+        self.logger.info(f"Starting scan for: {target_url} (profile {profile.name})")
+        lease = self.zap_pool.lease() if self.zap_pool else self.zap.track_scan()
+        with lease as zap:
+            self.zap = zap
+            log(f"Daemon ZAP: {zap.base_url}")
+            try:
+                self._run_zap_scan(target_url, json_path, deadline, log, progress, incremental, profile, scope)
+            except ZapApiError:
+                if self.zap_pool:
+                    self.zap_pool.report_failure(zap)
+                raise
 
+        log("Gerando relatório HTML...")
+        # série de execuções comparáveis: mesmo alvo (ou grupo de URLs) e mesmo perfil
+        run_target = f"{target_url}#scope-{scope_digest(scope)}" if scope and len(scope) > 1 else target_url
+        if not render_html_report(str(json_path), str(template_path), str(html_path),
+                                  target=run_target, profile=profile.name):
+            raise RuntimeError("Falha ao gerar relatório HTML")
 
-    def execute(self, target_url, log_callback=None):
+        # modo nativo roda no processo da API: o pico de memória não é só do scan
+        return ScanResult(
+            scan_id=safe_name,
+            report_json=str(json_path),
+            report_html=str(html_path),
+            wall_time=round(time.monotonic() - started, 3),
+            cpu_time=round(time.thread_time() - cpu_started, 3),
+        )
+
+    def _run_zap_scan(self, target_url, json_path, deadline, log, progress, incremental=False, profile=None,
+                      scope=None):
+        scope = scope or [target_url]
+        grouped = len(scope) > 1
+        context_name = f"temp_context_{int(time.time() * 1000)}"
+        contexts = [context_name]
+        context_id = self.zap.new_context(context_name)
         try:
-            safe_name = self._generate_safe_filename(target_url)
-            json_path = self.reports_dir / f'{safe_name}.json'
-            html_path = self.reports_dir / f'{safe_name}.html'
-            
-            cmd = [
-                str(self.script_path),
-                str(self.reports_dir),
-                str(self.template_dir),
-                self.template_file,
-                safe_name,
-                target_url,
-            ]
-            
-            self.logger.info(f"Starting scan for: {target_url}")
-
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
+            for url in scope:
+                self.zap.include_in_context(context_name, re.escape(url) + ".*")
+            if grouped:
+                # um único spider, semeado com a primeira URL; as demais entram na árvore pelo accessUrl
+                log(f"Agrupando {len(scope)} URLs de {target_url} num único contexto")
+                for url in scope[1:]:
+                    try:
+                        self.zap.access_url(url)
+                    except ZapApiError as e:
+                        log(f"Falha ao acessar {url}: {e}")
 
-            self.logger.info(f"Starting scan for: {target_url}")
+            log(f"1. Executando spider na URL (perfil {profile.name})...")
+            with SCAN_PHASE.time(phase="spider"):
+                with self.zap.configure_lock:
+                    self.zap.set_option("spider", "MaxDepth", profile.spider_max_depth)
+                    self.zap.set_option("spider", "MaxDuration", profile.spider_max_duration)
+                    spider_id = self.zap.spider_scan(
+                        scope[0], context_name=context_name, max_children=profile.spider_max_children
+                    )
+                log(f"Spider ID: {spider_id}")
 
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1
-            )
+                def on_spider_progress(percent):
+                    progress("spider", percent)
+                    log(f"Progresso do spider: {percent}%")
+
+                self.poller.wait(
+                    self.zap, "spider", spider_id,
+                    on_progress=on_spider_progress,
+                    timeout=self._remaining(deadline)
+                )
+
+            # baselines separados por perfil: alertas de um scan "quick" não cobrem um "deep"
+            baseline_key = target_url if profile.name == DEFAULT_PROFILE else f"{profile.name}:{target_url}"
+            if grouped:
+                # scan agrupado só vê parte do site: não mistura com o baseline do site inteiro
+                baseline_key += f"#scope-{scope_digest(scope)}"
+            fingerprints, previous, changed = {}, {}, None
+            if incremental:
+                baseline = self.baseline_store or get_baseline_store(self.reports_dir)
+                fingerprints = dict(
+                    fingerprint_message(m) for url in scope for m in self.zap.iter_messages(url)
+                )
+                fingerprints.pop("", None)
+                previous = baseline.fingerprints(baseline_key)
+                if previous:
+                    changed = [url for url, fp in fingerprints.items() if previous.get(url) != fp]
+                    log(f"Incremental: {len(changed)} URL(s) nova(s) ou alterada(s) de {len(fingerprints)}")
+                else:
+                    log("Incremental: sem baseline para o alvo, executando scan ativo completo")
+
+            if not profile.active_scan:
+                log("2. Perfil sem scan ativo, apenas alertas do scan passivo")
+                progress("ascan", 100)
+            elif changed is not None and not changed:
+                log("2. Nenhuma URL alterada, scan ativo ignorado")
+                progress("ascan", 100)
+            else:
+                ascan_context_id = context_id
+                if changed:
+                    incr_name = f"{context_name}_incr"
+                    ascan_context_id = self.zap.new_context(incr_name)
+                    contexts.append(incr_name)
+                    for url in changed:
+                        self.zap.include_in_context(incr_name, f"^{re.escape(url)}$")
+                    log(f"Incremental: scan ativo restrito a {len(changed)} URL(s) do contexto {incr_name}")
+
+                log("2. Iniciando scan ativo...")
+                with SCAN_PHASE.time(phase="ascan"):
+                    # agrupado ou incremental: sem URL, o ZAP varre todos os nós do contexto
+                    # (a raiz do alvo pode não estar no contexto `_incr` e seria rejeitada)
+                    scan_id = self._start_ascan(
+                        None if grouped or changed else target_url, ascan_context_id, profile
+                    )
+                    log(f"Scan ID: {scan_id}")
+                    start_time = time.monotonic()
+
+                    def on_ascan_progress(percent):
+                        progress("ascan", percent)
+                        elapsed = int(time.monotonic() - start_time)
+                        log(f"Progresso: {percent}% | Tempo decorrido: "
+                            f"{elapsed // 3600:02d}:{elapsed % 3600 // 60:02d}:{elapsed % 60:02d}")
 
-            for line in process.stdout:
-                line = line.strip()
-                if log_callback:
-                    log_callback(line)
-                self.logger.info(line)
+                    self.poller.wait(
+                        self.zap, "ascan", scan_id,
+                        on_progress=on_ascan_progress,
+                        timeout=self._remaining(deadline)
+                    )
 
-            process.wait(timeout=600)
+            # alertas passivos só ficam completos quando a fila do scanner passivo esvazia
+            with SCAN_PHASE.time(phase="pscan_drain"):
+                self._wait_passive_scan(deadline, log)
 
-            return ScanResult(
-                scan_id=safe_name,
-                report_json=str(json_path),
-                report_html=str(html_path)
+            log("3. Gerando relatório...")
+            with SCAN_PHASE.time(phase="report_fetch"):
+                alerts = self.zap.iter_alerts(target_url)
+                if grouped:
+                    prefixes = tuple(scope)
+                    alerts = (alert for alert in alerts if alert.get("url", "").startswith(prefixes))
+                if incremental:
+                    alerts = list(alerts)
+                    if changed is not None:
+                        changed_set = set(changed)
+                        unchanged = [url for url in fingerprints if url not in changed_set]
+                        carried = self._carry_over_alerts(baseline, baseline_key, unchanged, alerts)
+                        log(f"Incremental: {len(carried)} alerta(s) reaproveitado(s) de URLs inalteradas")
+                        alerts.extend(carried)
+                    baseline.save(baseline_key, fingerprints, alerts)
+                report = build_site_report(alerts, target_url)
+                with open(json_path, 'w', encoding='utf-8') as f:
+                    json_codec.dump(report, f)
+            log(f"Relatório gerado em {json_path}")
+
+            for url in scope:
+                try:
+                    self.zap.prune_site(url)
+                except Exception as e:
+                    self.logger.warning(f"Falha ao limpar sessão para {url}: {e}")
+        except TimeoutError:
+            error_msg = f"Scan timed out after {profile.timeout // 60} minutes"
+            self.logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        finally:
+            for name in contexts:
+                try:
+                    self.zap.remove_context(name)
+                except Exception as e:
+                    self.logger.warning(f"Falha ao remover contexto {name}: {e}")
+
+    def _wait_passive_scan(self, deadline, log):
+        """Aguarda `pscan/view/recordsToScan` chegar a 0; lança TimeoutError no prazo do scan."""
+        pending = self.zap.pscan_records_to_scan()
+        if pending:
+            log(f"Aguardando scan passivo: {pending} registro(s) na fila")
+        while pending:
+            if self._remaining(deadline) <= 0:
+                raise TimeoutError(f"Scan passivo com {pending} registro(s) pendente(s)")
+            time.sleep(min(PASSIVE_SCAN_POLL_INTERVAL, self._remaining(deadline)))
+            pending = self.zap.pscan_records_to_scan()
+
+    def _start_ascan(self, url, context_id, profile):
+        """Configura e inicia o scan ativo; recria a política se o daemon a perdeu (reinício)."""
+        for attempt in range(2):
+            self.zap.ensure_scan_policy(
+                profile.policy_name, profile.attack_strength, profile.alert_threshold, profile.scanners
             )
-            
-        except subprocess.TimeoutExpired:
-            process.kill()
-            error_msg = "Scan timed out after 10 minutes"
+            with self.zap.configure_lock:
+                self.zap.set_option("ascan", "ThreadPerHost", profile.thread_per_host)
+                self.zap.set_option("ascan", "MaxRuleDurationInMins", profile.max_rule_duration)
+                self.zap.set_option("ascan", "MaxScanDurationInMins", profile.max_scan_duration)
+                try:
+                    return self.zap.ascan_scan(url, context_id=context_id, scan_policy_name=profile.policy_name)
+                except ZapApiError as e:
+                    if e.code != "does_not_exist" or attempt:
+                        raise
+            self.logger.warning(f"Política {profile.policy_name} ausente no ZAP, recriando")
+            self.zap.forget_scan_policies()
+
+    @staticmethod
+    def _carry_over_alerts(baseline, target_url, urls, current):
+        """Alertas do baseline para `urls` que o scan atual não reproduziu."""
+        def key(alert):
+            return (alert.get("pluginId"), alert.get("alertRef"), alert.get("url"),
+                    alert.get("method"), alert.get("param"))
+
+        seen = {key(alert) for alert in current}
+        return [alert for alert in baseline.alerts_for(target_url, urls) if key(alert) not in seen]
+
+    def _remaining(self, deadline):
+        return max(0.0, deadline - time.monotonic())
+
+    def _execute_script(self, target_url, log_callback=None, progress_callback=None, profile=None):
+        safe_name = self._generate_safe_filename(target_url, profile)
+        json_path = self.reports_dir / f'{safe_name}.json'
+        html_path = self.reports_dir / f'{safe_name}.html'
+
+        cmd = [
+            str(self.script_path),
+            str(self.reports_dir),
+            str(self.template_dir),
+            self.template_file,
+            safe_name,
+            target_url,
+        ]
+
+        def on_line(line):
+            line = line.strip()
+            if log_callback:
+                log_callback(line)
+            if progress_callback:
+                match = SCRIPT_PROGRESS_PATTERN.match(line)
+                if match:
+                    phase = "spider" if match.group(1) else "ascan"
+                    progress_callback(phase, int(match.group(2)))
+            self.logger.info(line)
+
+        self.logger.info(f"Starting scan for: {target_url}")
+        try:
+            stats = run_supervised(cmd, profile.timeout, on_line=on_line)
+        except TimeoutError:
+            error_msg = f"Scan timed out after {profile.timeout // 60} minutes"
             self.logger.error(error_msg)
             raise RuntimeError(error_msg)
-        except Exception as e:
-            self.logger.error(f"Scan error: {str(e)}")
-            raise
\ No newline at end of file
+
+        self.logger.info(
+            f"Script finalizado: código {stats.returncode}, {stats.wall_time}s, "
+            f"CPU {stats.cpu_time:.1f}s, pico de memória {stats.peak_rss_kb} KB"
+        )
+        if stats.returncode != 0:
+            raise RuntimeError(f"Scan script exited with code {stats.returncode}")
+        if not report_exists(html_path):
+            raise RuntimeError("Scan script finished without generating the HTML report")
+
+        return ScanResult(
+            scan_id=safe_name,
+            report_json=str(json_path),
+            report_html=str(html_path),
+            wall_time=stats.wall_time,
+            cpu_time=round(stats.cpu_time, 3),
+            peak_rss_kb=stats.peak_rss_kb,
+        )
@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import logging
+import threading
+from dataclasses import dataclass, field
+
+
+@dataclass(order=True)
+class _QueuedJob:
+    sort_key: tuple
+    key: str = field(compare=False)
+    func: object = field(compare=False)
+    args: tuple = field(compare=False, default=())
+    cancelled: bool = field(compare=False, default=False)
+
+
+class ScanScheduler:
+    """
+    Agenda scans com limite de concorrência.
+
+    Os jobs ficam numa fila de prioridade (maior prioridade primeiro, FIFO dentro
+    da mesma prioridade) e só são executados quando um dos `max_workers` workers
+    fica livre. Jobs enfileirados não consomem thread nem trabalho no ZAP.
+
+    Quem decide se a chave pode ser agendada é o `scan_state`: um novo `submit`
+    substitui o job ainda enfileirado da mesma chave (ex.: cancelado por outro
+    worker) e, se a chave ainda estiver executando (finalizando índice e
+    notificações), espera esse job terminar antes de começar.
+    """
+
+    def __init__(self, max_workers=2):
+        if max_workers < 1:
+            raise ValueError("max_workers deve ser >= 1")
+        self.max_workers = max_workers
+        self.logger = logging.getLogger('ScanScheduler')
+        self._cond = threading.Condition()
+        self._heap = []
+        self._queued = {}
+        self._running = set()
+        self._workers = []
+        self._counter = itertools.count()
+
+    def submit(self, key, func, *args, priority=0):
+        """Enfileira `func(*args)` e retorna a posição do job na fila (1 = próximo)."""
+        with self._cond:
+            stale = self._queued.pop(key, None)
+            if stale is not None:
+                stale.cancelled = True
+            job = _QueuedJob((-priority, next(self._counter)), key, func, args)
+            heapq.heappush(self._heap, job)
+            self._queued[key] = job
+            self._ensure_worker()
+            self._cond.notify()
+            return self._position(key)
+
+    def cancel(self, key):
+        """Remove um job da fila. Retorna False se ele não estiver enfileirado."""
+        with self._cond:
+            job = self._queued.pop(key, None)
+            if job is None:
+                return False
+            job.cancelled = True
+            return True
+
+    def position(self, key):
+        """Posição do job na fila (1-based) ou None se não estiver enfileirado."""
+        with self._cond:
+            return self._position(key)
+
+    def is_running(self, key):
+        with self._cond:
+            return key in self._running
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "running": len(self._running),
+                "queued": len(self._queued),
+            }
+
+    def _position(self, key):
+        job = self._queued.get(key)
+        if job is None:
+            return None
+        return 1 + sum(1 for other in self._queued.values() if other.sort_key < job.sort_key)
+
+    def _ensure_worker(self):
+        idle = len(self._workers) - len(self._running)
+        if idle >= len(self._queued) or len(self._workers) >= self.max_workers:
+            return
+        worker = threading.Thread(
+            target=self._worker_loop,
+            name=f"scan-worker-{len(self._workers) + 1}",
+            daemon=True
+        )
+        self._workers.append(worker)
+        worker.start()
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                job, deferred = None, []
+                while self._heap:
+                    candidate = heapq.heappop(self._heap)
+                    if candidate.cancelled:
+                        continue
+                    if candidate.key in self._running:
+                        # um job por chave de cada vez
+                        deferred.append(candidate)
+                        continue
+                    job = candidate
+                    break
+                for candidate in deferred:
+                    heapq.heappush(self._heap, candidate)
+                if job is not None:
+                    del self._queued[job.key]
+                    self._running.add(job.key)
+                    return job
+                self._cond.wait()
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            try:
+                job.func(*job.args)
+            except Exception as e:
+                self.logger.error(f"Erro no job {job.key}: {e}")
+            finally:
+                with self._cond:
+                    self._running.discard(job.key)
+                    self._cond.notify()
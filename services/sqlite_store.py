@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    Base dos stores em SQLite do volume de relatórios.
+
+    Uma conexão por thread, modo WAL (leitores não bloqueiam o escritor) e
+    transações explícitas: `_transaction()` abre `BEGIN IMMEDIATE` para escrita,
+    leituras simples usam `_conn()` direto.
+    """
+
+    schema = ""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn().executescript(self.schema)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, immediate=True):
+        return _Transaction(self._conn(), "BEGIN IMMEDIATE" if immediate else "BEGIN")
+
+
+class _Transaction:
+    """Abre a transação na entrada e faz commit/rollback na saída."""
+
+    def __init__(self, conn, begin):
+        self.conn = conn
+        self.begin = begin
+
+    def __enter__(self):
+        self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
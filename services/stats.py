@@ -0,0 +1,69 @@
+from collections import Counter
+
+RISK_KEYS = {"3": "high", "2": "medium", "1": "low"}
+CONFIDENCE_KEYS = {"4": "confirmed", "3": "high", "2": "medium", "1": "low", "0": "false_positive"}
+
+
+def aggregate_alerts(alertas):
+    """
+    Estatísticas do relatório numa única passada pelos alertas.
+
+    Retorna:
+    - `risks`: alertas por risco (high, medium, low, info, total) — o formato
+      usado pelos cartões do relatório;
+    - `instances`: instâncias (URLs afetadas) por risco, mesmo formato;
+    - `by_confidence`, `by_cwe`: instâncias por confiança e por CWE;
+    - `by_plugin`: por plugin, nome, risco, alertas e instâncias.
+
+    O custo é linear no número de alertas + instâncias.
+    """
+    risks = Counter()
+    instances = Counter()
+    by_confidence = Counter()
+    by_cwe = Counter()
+    by_plugin = {}
+
+    for alerta in alertas:
+        risk = RISK_KEYS.get(str(alerta.get("riskcode", "0")), "info")
+        count = len(alerta.get("instances", ()))
+        risks[risk] += 1
+        instances[risk] += count
+        by_confidence[CONFIDENCE_KEYS.get(str(alerta.get("confidence", "")), "unknown")] += count
+        by_cwe[str(alerta.get("cweid", "")) or "unknown"] += count
+
+        pluginid = str(alerta.get("pluginid", ""))
+        plugin = by_plugin.get(pluginid)
+        if plugin is None:
+            plugin = by_plugin[pluginid] = {
+                "name": alerta.get("name", alerta.get("alert", "")),
+                "risk": risk,
+                "alerts": 0,
+                "instances": 0,
+            }
+        plugin["alerts"] += 1
+        plugin["instances"] += count
+
+    def by_risk(counter):
+        totals = {key: counter[key] for key in ("high", "medium", "low", "info")}
+        totals["total"] = sum(totals.values())
+        return totals
+
+    return {
+        "risks": by_risk(risks),
+        "instances": by_risk(instances),
+        "by_confidence": dict(by_confidence.most_common()),
+        "by_cwe": dict(by_cwe.most_common()),
+        "by_plugin": by_plugin,
+    }
+
+
+def index_risk_counts(stats):
+    """Contagens no formato `quantidade_riscos` do índice de relatórios."""
+    risks = stats["risks"]
+    return {
+        "alto": risks["high"],
+        "medio": risks["medium"],
+        "baixo": risks["low"],
+        "informativo": risks["info"],
+        "total": risks["total"],
+    }
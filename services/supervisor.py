@@ -0,0 +1,126 @@
+import logging
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger('Supervisor')
+
+
+@dataclass
+class ProcessStats:
+    returncode: int
+    wall_time: float
+    cpu_user: float
+    cpu_system: float
+    peak_rss_kb: int
+    timed_out: bool = False
+
+    @property
+    def cpu_time(self):
+        return self.cpu_user + self.cpu_system
+
+
+def run_supervised(cmd, timeout, on_line=None, kill_grace=10.0):
+    """
+    Executa `cmd` supervisionado e retorna `ProcessStats`.
+
+    - O processo roda num grupo próprio; no fim do prazo o grupo inteiro recebe
+      SIGTERM e, após `kill_grace` segundos, SIGKILL (inclui curl/jq/filhos).
+    - `timeout` é um prazo de relógio desde o início, não a partir do fim da
+      saída: um processo que trava escrevendo ou em silêncio é interrompido.
+    - `on_line(linha)` recebe cada linha de stdout/stderr na thread chamadora.
+    - Tempo de CPU e pico de memória vêm do `wait4` (processo + filhos aguardados).
+
+    Lança `TimeoutError` (com as estatísticas em `args[1]`) se o prazo estourar.
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1,
+        start_new_session=True,
+    )
+
+    lines = queue.Queue()
+
+    def read_output():
+        try:
+            for line in process.stdout:
+                lines.put(line.rstrip("\n"))
+        finally:
+            lines.put(None)
+
+    exit_info = {}
+
+    def wait_exit():
+        _, status, rusage = os.wait4(process.pid, 0)
+        exit_info["status"] = status
+        exit_info["rusage"] = rusage
+        exit_info["ended"] = time.monotonic()
+
+    reader = threading.Thread(target=read_output, name=f"supervisor-out-{process.pid}", daemon=True)
+    waiter = threading.Thread(target=wait_exit, name=f"supervisor-wait-{process.pid}", daemon=True)
+    reader.start()
+    waiter.start()
+
+    timed_out = False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        try:
+            line = lines.get(timeout=remaining)
+        except queue.Empty:
+            continue
+        if line is None:
+            break
+        if on_line:
+            on_line(line)
+
+    if not timed_out:
+        waiter.join(max(0.0, deadline - time.monotonic()))
+        timed_out = waiter.is_alive()
+
+    if timed_out:
+        logger.warning(f"Prazo de {timeout}s estourado, encerrando grupo do processo {process.pid}")
+        _kill_group(process.pid, signal.SIGTERM)
+        waiter.join(kill_grace)
+        if waiter.is_alive():
+            _kill_group(process.pid, signal.SIGKILL)
+            waiter.join()
+    else:
+        # filhos que ficaram em segundo plano não sobrevivem ao scan
+        _kill_group(process.pid, signal.SIGKILL)
+
+    reader.join(kill_grace)
+    process.stdout.close()
+    # o status já foi coletado pelo wait4; evita que o Popen tente esperar de novo
+    process.returncode = os.waitstatus_to_exitcode(exit_info["status"])
+
+    rusage = exit_info["rusage"]
+    stats = ProcessStats(
+        returncode=process.returncode,
+        wall_time=round(exit_info["ended"] - start, 3),
+        cpu_user=round(rusage.ru_utime, 3),
+        cpu_system=round(rusage.ru_stime, 3),
+        peak_rss_kb=rusage.ru_maxrss,
+        timed_out=timed_out,
+    )
+    if timed_out:
+        raise TimeoutError(f"Processo excedeu o prazo de {timeout}s", stats)
+    return stats
+
+
+def _kill_group(pid, sig):
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
@@ -0,0 +1,35 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_target(url):
+    """
+    Forma canônica de uma URL alvo, usada como chave de scans e do cache.
+
+    Esquema e host em minúsculas, sem porta padrão, sem fragmento, sem barra
+    final no path e com a query ordenada. `HTTPS://Site.com:443/app/` e
+    `https://site.com/app` viram a mesma chave.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        raise ValueError(f"URL must start with http:// or https://: {url}")
+    if not parts.hostname:
+        raise ValueError(f"URL without host: {url}")
+
+    host = parts.hostname.rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError as e:
+        raise ValueError(f"Invalid port in URL: {url}") from e
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path.rstrip("/")
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return f"{scheme}://{netloc}{path}" + (f"?{query}" if query else "")
@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from services.metrics import ZAP_API_ERRORS, ZAP_API_LATENCY
+
+
+class ZapApiError(RuntimeError):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        # código de erro da API do ZAP (ex.: "already_exists", "does_not_exist"), quando houver
+        self.code = code
+
+
+class ZapClient:
+    """
+    Cliente HTTP da API do ZAP executado dentro do processo.
+
+    Usa uma única `requests.Session` com pool de conexões keep-alive, então
+    cada chamada reaproveita sockets abertos em vez de criar um `curl` novo.
+    """
+
+    def __init__(self, base_url=None, api_key=None, timeout=30, pool_size=10, session_reset_every=None,
+                 session_reset_guard=None):
+        if base_url is None:
+            host = os.getenv("ZAP_HOST", "localhost")
+            port = os.getenv("ZAP_PORT", "8090")
+            base_url = f"http://{host}:{port}"
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key if api_key is not None else os.getenv("ZAP_API_KEY", "")
+        self.timeout = timeout
+        self.logger = logging.getLogger('ZapClient')
+        if session_reset_every is None:
+            session_reset_every = int(os.getenv("ZAP_SESSION_RESET_EVERY", "20"))
+        self.session_reset_every = session_reset_every
+        # callable que diz se outros processos estão sem scans neste daemon (o contador é por processo)
+        self.session_reset_guard = session_reset_guard
+        self._scan_lock = threading.Lock()
+        self._active_scans = 0
+        self._scans_since_reset = 0
+        # opções de spider/ascan são globais no daemon: configurar e iniciar o scan sob este lock
+        self.configure_lock = threading.Lock()
+        self._policy_lock = threading.Lock()
+        self._scan_policies = set()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, fmt, component, kind, name, params):
+        url = f"{self.base_url}/{fmt}/{component}/{kind}/{name}/"
+        query = {k: v for k, v in params.items() if v is not None}
+        if self.api_key:
+            query["apikey"] = self.api_key
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params=query, timeout=self.timeout)
+        except requests.RequestException as e:
+            ZAP_API_ERRORS.inc(component=component, name=name)
+            raise ZapApiError(f"ZAP API unreachable ({component}/{name}): {e}") from e
+        finally:
+            ZAP_API_LATENCY.observe(time.perf_counter() - started, component=component, name=name)
+        if response.status_code != 200:
+            ZAP_API_ERRORS.inc(component=component, name=name)
+            try:
+                code = response.json().get("code")
+            except ValueError:
+                code = None
+            raise ZapApiError(
+                f"ZAP API error ({component}/{name}): HTTP {response.status_code} {response.text[:200]}",
+                code=code,
+            )
+        return response
+
+    def _json(self, component, kind, name, **params):
+        return self._request("JSON", component, kind, name, params).json()
+
+    def _other(self, component, name, **params):
+        return self._request("OTHER", component, "other", name, params)
+
+    def version(self):
+        return self._json("core", "view", "version")["version"]
+
+    def new_context(self, context_name):
+        return self._json("context", "action", "newContext", contextName=context_name)["contextId"]
+
+    def include_in_context(self, context_name, regex):
+        self._json("context", "action", "includeInContext", contextName=context_name, regex=regex)
+
+    def remove_context(self, context_name):
+        self._json("context", "action", "removeContext", contextName=context_name)
+
+    def set_option(self, component, option, value):
+        """Altera uma opção global do daemon (ex.: spider MaxDepth, ascan ThreadPerHost)."""
+        self._json(component, "action", f"setOption{option}", Integer=int(value))
+
+    def scan_policy_names(self):
+        return self._json("ascan", "view", "scanPolicyNames")["scanPolicyNames"]
+
+    def add_scan_policy(self, policy_name, attack_strength, alert_threshold, scanner_ids=None):
+        """
+        Cria uma política de scan; com `scanner_ids`, só essas regras ficam habilitadas.
+        Se ela já existir no daemon (criada por outro processo), só reaplica as regras.
+        """
+        try:
+            self._json("ascan", "action", "addScanPolicy", scanPolicyName=policy_name,
+                       attackStrength=attack_strength, alertThreshold=alert_threshold)
+        except ZapApiError as e:
+            if e.code != "already_exists":
+                raise
+        if scanner_ids is not None:
+            self._json("ascan", "action", "disableAllScanners", scanPolicyName=policy_name)
+            self._json("ascan", "action", "enableScanners", scanPolicyName=policy_name,
+                       ids=",".join(str(i) for i in scanner_ids))
+
+    def ensure_scan_policy(self, policy_name, attack_strength, alert_threshold, scanner_ids=None):
+        """Cria a política uma única vez por daemon (o nome deve mudar junto com a configuração)."""
+        with self._policy_lock:
+            if policy_name in self._scan_policies:
+                return
+            if policy_name not in self.scan_policy_names():
+                self.add_scan_policy(policy_name, attack_strength, alert_threshold, scanner_ids)
+            self._scan_policies.add(policy_name)
+
+    def forget_scan_policies(self):
+        """Esquece as políticas já criadas (o daemon reiniciou e perdeu as políticas)."""
+        with self._policy_lock:
+            self._scan_policies.clear()
+
+    def spider_scan(self, url, context_name=None, max_children=None):
+        data = self._json("spider", "action", "scan", url=url, contextName=context_name,
+                          maxChildren=max_children)
+        if data.get("scan") in (None, "", "null"):
+            raise ZapApiError(f"Falha ao iniciar spider. Resposta: {data}")
+        return data["scan"]
+
+    def spider_status(self, scan_id):
+        return int(self._json("spider", "view", "status", scanId=scan_id)["status"])
+
+    def spider_scans(self):
+        """Progresso de todos os spiders do daemon, como {scan_id: percent}."""
+        return self._progress_map(self._json("spider", "view", "scans"))
+
+    def ascan_scan(self, url, context_id=None, scan_policy_name=None):
+        data = self._json("ascan", "action", "scan", url=url, contextId=context_id,
+                          scanPolicyName=scan_policy_name)
+        if data.get("scan") in (None, "", "null"):
+            raise ZapApiError(f"Falha ao iniciar scan. Resposta: {data}")
+        return data["scan"]
+
+    def ascan_status(self, scan_id):
+        return int(self._json("ascan", "view", "status", scanId=scan_id)["status"])
+
+    def ascan_scans(self):
+        """Progresso de todos os scans ativos do daemon, como {scan_id: percent}."""
+        return self._progress_map(self._json("ascan", "view", "scans"))
+
+    def pscan_records_to_scan(self):
+        """Mensagens ainda na fila do scanner passivo."""
+        return int(self._json("pscan", "view", "recordsToScan")["recordsToScan"])
+
+    @staticmethod
+    def _progress_map(data):
+        return {str(scan["id"]): int(scan["progress"]) for scan in data.get("scans", [])}
+
+    def json_report(self):
+        """Relatório de todos os sites da sessão. Prefira `iter_alerts` por alvo."""
+        return self._other("core", "jsonreport").json()
+
+    def iter_alerts(self, baseurl, page_size=500):
+        """Itera os alertas (um por instância) sob `baseurl`, paginando a API de alertas."""
+        start = 0
+        while True:
+            page = self._json("alert", "view", "alerts", baseurl=baseurl, start=start, count=page_size)["alerts"]
+            yield from page
+            if len(page) < page_size:
+                return
+            start += page_size
+
+    def iter_messages(self, baseurl, page_size=200):
+        """Itera as mensagens HTTP do histórico sob `baseurl` (cabeçalhos e corpos)."""
+        start = 0
+        while True:
+            page = self._json("core", "view", "messages", baseurl=baseurl, start=start, count=page_size)["messages"]
+            yield from page
+            if len(page) < page_size:
+                return
+            start += page_size
+
+    def prune_site(self, baseurl):
+        """Remove da sessão os alertas e a árvore de sites do alvo já reportado."""
+        self._json("alert", "action", "deleteAlerts", baseurl=baseurl)
+        self._json("core", "action", "deleteSiteNode", url=baseurl)
+
+    def access_url(self, url):
+        """Faz o ZAP requisitar `url`, adicionando-a à árvore de sites (semente extra do scan)."""
+        self._json("core", "action", "accessUrl", url=url, followRedirects="true")
+
+    def new_session(self):
+        self._json("core", "action", "newSession", overwrite="true")
+
+    @contextmanager
+    def track_scan(self):
+        """
+        Marca um scan em andamento neste daemon.
+
+        A cada `session_reset_every` scans concluídos, quando nenhum outro scan está
+        rodando, a sessão do ZAP é recriada para que o histórico não cresça sem limite.
+        Com `session_reset_guard`, o reset também espera os scans de outros processos
+        que compartilham o daemon; enquanto houver algum, ele fica para o próximo scan.
+        """
+        with self._scan_lock:
+            self._active_scans += 1
+        try:
+            yield self
+        finally:
+            with self._scan_lock:
+                self._active_scans -= 1
+                self._scans_since_reset += 1
+                if (self.session_reset_every > 0
+                        and self._active_scans == 0
+                        and self._scans_since_reset >= self.session_reset_every
+                        and self._reset_allowed()):
+                    self._scans_since_reset = 0
+                    try:
+                        self.new_session()
+                        self.logger.info("Sessão do ZAP recriada")
+                    except ZapApiError as e:
+                        self.logger.warning(f"Falha ao recriar sessão do ZAP: {e}")
+
+    def _reset_allowed(self):
+        if self.session_reset_guard is None:
+            return True
+        try:
+            return self.session_reset_guard()
+        except Exception as e:
+            self.logger.warning(f"Reset da sessão adiado: falha ao consultar outros processos: {e}")
+            return False
+
+    @property
+    def active_scans(self):
+        return self._active_scans
+
+    def close(self):
+        self.session.close()
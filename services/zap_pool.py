@@ -0,0 +1,119 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from services.zap_client import ZapApiError, ZapClient
+
+
+class ZapPool:
+    """
+    Conjunto de daemons ZAP com despacho para o menos carregado.
+
+    Cada scan pega um daemon com `lease()`. A escolha considera só daemons
+    saudáveis; uma thread de health check consulta `core/view/version` de cada
+    um e tira de rotação quem falhar `failure_threshold` vezes seguidas,
+    devolvendo-o quando voltar a responder.
+    """
+
+    def __init__(self, clients, health_interval=15.0, failure_threshold=3):
+        if not clients:
+            raise ValueError("O pool precisa de pelo menos um daemon ZAP")
+        self.clients = list(clients)
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.logger = logging.getLogger('ZapPool')
+        self._lock = threading.Lock()
+        self._leases = {client: 0 for client in self.clients}
+        self._failures = {client: 0 for client in self.clients}
+        self._healthy = {client: True for client in self.clients}
+        self._health_thread = None
+
+    @classmethod
+    def from_env(cls, **client_kwargs):
+        """
+        Monta o pool a partir de `ZAP_ENDPOINTS` (URLs separadas por vírgula).
+        Sem a variável, usa um único daemon em `ZAP_HOST`:`ZAP_PORT`.
+        """
+        endpoints = [e.strip() for e in os.getenv("ZAP_ENDPOINTS", "").split(",") if e.strip()]
+        if not endpoints:
+            return cls([ZapClient(**client_kwargs)])
+        return cls([ZapClient(base_url=endpoint, **client_kwargs) for endpoint in endpoints])
+
+    @contextmanager
+    def lease(self):
+        """Reserva o daemon saudável com menos scans em andamento durante o bloco."""
+        client = self._acquire()
+        try:
+            with client.track_scan():
+                yield client
+        finally:
+            with self._lock:
+                self._leases[client] -= 1
+
+    def _acquire(self):
+        self._ensure_health_thread()
+        with self._lock:
+            candidates = [c for c in self.clients if self._healthy[c]]
+            if not candidates:
+                raise ZapApiError("Nenhum daemon ZAP saudável disponível")
+            client = min(candidates, key=lambda c: self._leases[c])
+            self._leases[client] += 1
+            return client
+
+    def report_failure(self, client):
+        """Registra uma falha observada fora do health check (ex.: erro de API durante um scan)."""
+        self._record(client, ok=False)
+
+    def status(self):
+        with self._lock:
+            return [
+                {
+                    "endpoint": client.base_url,
+                    "healthy": self._healthy[client],
+                    "active_scans": self._leases[client],
+                    "consecutive_failures": self._failures[client],
+                }
+                for client in self.clients
+            ]
+
+    def _record(self, client, ok):
+        with self._lock:
+            if ok:
+                if not self._healthy[client]:
+                    self.logger.info(f"Daemon ZAP de volta à rotação: {client.base_url}")
+                    # um daemon que voltou provavelmente reiniciou sem as políticas de scan
+                    client.forget_scan_policies()
+                self._failures[client] = 0
+                self._healthy[client] = True
+                return
+            self._failures[client] += 1
+            if self._healthy[client] and self._failures[client] >= self.failure_threshold:
+                self._healthy[client] = False
+                self.logger.warning(f"Daemon ZAP fora de rotação: {client.base_url}")
+
+    def check_health(self):
+        for client in self.clients:
+            try:
+                client.version()
+                self._record(client, ok=True)
+            except Exception as e:
+                self.logger.warning(f"Health check falhou para {client.base_url}: {e}")
+                self._record(client, ok=False)
+
+    def _ensure_health_thread(self):
+        if self.health_interval <= 0:
+            return
+        with self._lock:
+            if self._health_thread is not None and self._health_thread.is_alive():
+                return
+            self._health_thread = threading.Thread(
+                target=self._health_loop, name="zap-health-check", daemon=True
+            )
+            self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            self.check_health()
@@ -0,0 +1,80 @@
+import html
+from datetime import datetime
+from urllib.parse import urlsplit
+
+RISK_CODES = {"Informational": "0", "Low": "1", "Medium": "2", "High": "3"}
+CONFIDENCE_CODES = {"False Positive": "0", "Low": "1", "Medium": "2", "High": "3", "Confirmed": "4"}
+
+
+def _paragraphs(text):
+    """Converte texto puro da API de alertas no HTML em parágrafos do jsonreport."""
+    if not text:
+        return ""
+    return "".join(f"<p>{html.escape(line)}</p>" for line in text.split("\n") if line.strip())
+
+
+def site_attributes(target_url):
+    parts = urlsplit(target_url)
+    ssl = parts.scheme == "https"
+    port = parts.port or (443 if ssl else 80)
+    return {
+        "@name": f"{parts.scheme}://{parts.netloc}",
+        "@host": parts.hostname or "",
+        "@port": str(port),
+        "@ssl": str(ssl).lower(),
+    }
+
+
+def build_site_report(alerts, target_url):
+    """
+    Monta um relatório no formato do `jsonreport` do ZAP, com um único site,
+    a partir dos alertas (um por instância) devolvidos pela API `alert/view/alerts`.
+
+    Os alertas são agrupados por pluginId/alertRef, como no relatório original.
+    """
+    grouped = {}
+    for alert in alerts:
+        key = (alert.get("pluginId", ""), alert.get("alertRef", ""))
+        entry = grouped.get(key)
+        if entry is None:
+            risk = alert.get("risk", "Informational")
+            confidence = alert.get("confidence", "Medium")
+            entry = {
+                "pluginid": alert.get("pluginId", ""),
+                "alertRef": alert.get("alertRef", ""),
+                "alert": alert.get("alert", ""),
+                "name": alert.get("name", alert.get("alert", "")),
+                "riskcode": RISK_CODES.get(risk, "0"),
+                "confidence": CONFIDENCE_CODES.get(confidence, "2"),
+                "riskdesc": f"{risk} ({confidence})",
+                "desc": _paragraphs(alert.get("description")),
+                "instances": [],
+                "count": "0",
+                "solution": _paragraphs(alert.get("solution")),
+                "otherinfo": _paragraphs(alert.get("other")),
+                "reference": _paragraphs(alert.get("reference")),
+                "cweid": alert.get("cweid", ""),
+                "wascid": alert.get("wascid", ""),
+                "sourceid": alert.get("sourceid", ""),
+            }
+            grouped[key] = entry
+        entry["instances"].append({
+            "id": alert.get("id", ""),
+            "uri": alert.get("url", ""),
+            "method": alert.get("method", ""),
+            "param": alert.get("param", ""),
+            "attack": alert.get("attack", ""),
+            "evidence": alert.get("evidence", ""),
+            "otherinfo": alert.get("other", ""),
+        })
+
+    site_alerts = list(grouped.values())
+    for entry in site_alerts:
+        entry["count"] = str(len(entry["instances"]))
+    site_alerts.sort(key=lambda a: -int(a["riskcode"]))
+
+    return {
+        "@programName": "ZAP",
+        "@generated": datetime.now().astimezone().strftime("%a, %d %b %Y %H:%M:%S %z"),
+        "site": [{**site_attributes(target_url), "alerts": site_alerts}],
+    }
@@ -1,64 +1,226 @@
 import datetime
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, jsonify, request, send_file, url_for
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from pathlib import Path
+from werkzeug.utils import safe_join
+import hashlib
+import io
+import mimetypes
 import os
-import json
-import threading
+import time
+from services import json_codec, metrics, report_storage
+from services.batch import (MAX_BATCH_URLS, BatchStore, expand_sitemap, group_targets, new_batch_id, origin_of,
+                            summarize_batch)
 from services.scanner import ZapScanner
+from services.notifier import NotificationDispatcher
+from services.profiles import DEFAULT_PROFILE, PROFILES, get_profile
 from services.render import render_html_report
+from services.report_index import get_report_index
+from services.scan_history import ScanHistory, new_scan_id
+from services.scan_state import ACTIVE_STATUSES, create_scan_state_store
+from services.scheduler import ScanScheduler
+from services.urls import normalize_target
+from services.zap_pool import ZapPool
 
 script_path = "/app/scripts/run-zap.sh"
 reports_dir = os.getenv("REPORTS_DIR", "/app/reports")
 template_dir = os.getenv("TEMPLATE_DIR", "/app/templates")
 template_file = "model-reports-dark.html"
-index_filename = "reports_index.json"
+max_concurrent_scans = int(os.getenv("MAX_CONCURRENT_SCANS", "2"))
+default_cache_max_age = int(os.getenv("SCAN_CACHE_MAX_AGE", "0"))
+default_scan_profile = os.getenv("DEFAULT_SCAN_PROFILE", DEFAULT_PROFILE)
+max_long_poll_wait = 30
+sse_keepalive_interval = 15
+risk_filter_codes = {"high": 3, "medium": 2, "low": 1, "info": 0}
+
+scan_state = create_scan_state_store(os.getenv("SCAN_STATE_BACKEND", "memory"), reports_dir)
+scan_history = ScanHistory(reports_dir)
+scan_scheduler = ScanScheduler(max_workers=max_concurrent_scans)
+zap_pool = ZapPool.from_env(
+    pool_size=max(10, max_concurrent_scans * 2),
+    # a sessão do daemon é compartilhada: só recria quando nenhum outro processo tem scan nele
+    session_reset_guard=lambda: scan_state.running_elsewhere() == 0,
+)
+notifications = NotificationDispatcher.from_env()
+batches = BatchStore(reports_dir)
+metrics.QUEUE_DEPTH.set_function(lambda: scan_scheduler.stats()["queued"])
+metrics.ACTIVE_SCANS.set_function(lambda: scan_scheduler.stats()["running"])
+
+
+def _scan_key(url):
+    """Chave do scan: a URL normalizada, ou a própria string se não for uma URL válida."""
+    try:
+        return normalize_target(url)
+    except ValueError:
+        return url
+
+
+def _iso(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+
+def _history_view(scan, offset=None):
+    """Registro do histórico no formato da API; com `offset`, só o final do log a partir dele."""
+    view = dict(scan)
+    for field in ("queued_at", "started_at", "finished_at"):
+        view[field] = _iso(view.get(field))
+    logs = view.pop("logs", None)
+    if logs is not None:
+        view["last_log"] = logs[-1] if logs else None
+        if offset is not None:
+            first = view["log_count"] - len(logs)
+            view["logs"], view["next_offset"] = logs[max(0, offset - first):], view["log_count"]
+    return view
+
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """JSON das respostas e requisições via `services.json_codec` (orjson se instalado), sempre compacto."""
+
+    def dumps(self, obj, **kwargs):
+        return json_codec.dumps(obj, default=self.default)
+
+    def loads(self, s, **kwargs):
+        return json_codec.loads(s)
 
-active_scans = {}
-scan_lock = threading.Lock()
 
 def create_app():
     app = Flask(__name__)
+    app.json = CodecJSONProvider(app)
     CORS(app, resources={r"/*": {"origins": [
         "http://localhost:5500", 
         "http://localhost:3000", 
         "https://zapscanner.bne.com.br",
     ]}})
     
-    def run_scan_async(url):
+    def notify_scan_finished(url, status, **fields):
+        """Enfileira a notificação de fim de scan; nunca interrompe nem atrasa o scan."""
+        if not notifications.enabled:
+            return
+        try:
+            if status == "completed":
+                # o índice é por `url_executado` (só esquema + host): busca pelo relatório gravado
+                report = get_report_index(reports_dir).get_by_html(fields["caminho_html"])
+                if report:
+                    fields["quantidade_riscos"] = report["quantidade_riscos"]
+            notifications.notify({"url": url, "status": status, **fields})
+        except Exception as e:
+            print(f"Erro ao enfileirar notificação: {e}")
+
+    def save_history(scan_id, **fields):
+        """Grava no histórico durável; uma falha aqui nunca interrompe o scan."""
+        try:
+            scan_history.update(scan_id, **fields)
+        except Exception as e:
+            print(f"Erro ao gravar histórico do scan {scan_id}: {e}")
+
+    def finish_history(scan_id, url, status, **fields):
+        logs, log_count = scan_state.read_logs(url, 0)
+        save_history(scan_id, status=status, finished_at=time.time(), logs=logs, log_count=log_count, **fields)
+
+    def register_scan(url, record):
+        """Registra o scan no estado e no histórico. Retorna o `scan_id` ou None se a URL já tiver scan ativo."""
+        scan_id = new_scan_id()
+        if not scan_state.try_start(url, {**record, "scan_id": scan_id}):
+            return None
+        try:
+            scan_history.record(scan_id, url, **{k: v for k, v in record.items() if k != "url"})
+        except Exception as e:
+            print(f"Erro ao gravar histórico do scan {scan_id}: {e}")
+        return scan_id
+
+    def enqueue(scan_id, url, *args, priority=0):
+        """Agenda um scan já registrado; se o agendamento falhar, o registro vira `failed`."""
+        try:
+            scan_scheduler.submit(url, run_scan_async, scan_id, url, *args, priority=priority)
+            return True
+        except Exception as e:
+            print(f"Erro ao agendar scan {scan_id}: {e}")
+            scan_state.transition(
+                url, ("queued",),
+                scan_id=scan_id,
+                status="failed",
+                error=str(e),
+                date=datetime.datetime.now().isoformat()
+            )
+            scan_state.close_log(url)
+            finish_history(scan_id, url, "failed", error=str(e))
+            return False
+
+    def run_scan_async(scan_id, url, profile, incremental=False, scope=None):
+        # com `scan_id`: um job antigo que ficou na fila não inicia o scan registrado depois dele
+        started = scan_state.transition(
+            url, ("queued",),
+            scan_id=scan_id,
+            status="running",
+            started_at=datetime.datetime.now().isoformat()
+        )
+        if not started:
+            print(f"Scan cancelado antes de iniciar: {url}")
+            return
+        save_history(scan_id, status="running", started_at=time.time())
         try:
             print(f"Iniciando scan para {url}")
-            def log_callback(line):
-                with scan_lock:
-                    logs = active_scans[url].setdefault("logs", [])
-                    logs.append(line)
             scanner = ZapScanner(
                 script_path,
                 reports_dir,
                 template_dir,
                 template_file,
+                zap_pool=zap_pool,
+            )
+            # scan agrupado: a chave identifica o conjunto de URLs, o alvo do ZAP é a origem
+            target = origin_of(scope[0]) if scope else url
+            result = scanner.execute(
+                target,
+                log_callback=lambda line: scan_state.append_log(url, line),
+                progress_callback=lambda phase, percent: scan_state.set_progress(url, phase, percent),
+                incremental=incremental,
+                profile=profile,
+                scope=scope,
             )
-            result = scanner.execute(url, log_callback=log_callback)
             print(f"Scan finalizado para {url}")
+            metrics.SCANS.inc(status="completed", profile=profile)
+            if result.wall_time is not None:
+                metrics.SCAN_DURATION.observe(result.wall_time, profile=profile)
 
+            caminho_html = os.path.basename(result.report_html)
+            reports_index = get_report_index(reports_dir)
+            report = reports_index.get_by_html(caminho_html)
+            riscos = report["quantidade_riscos"] if report else None
             report_data = {
                 **result.__dict__,
+                "scan_id": scan_id,
                 "date": datetime.datetime.now().isoformat(),
                 "url": url,
+                "caminho_html": caminho_html,
+                "quantidade_riscos": riscos,
                 "status": "completed"
             }
-            with scan_lock:
-                active_scans[url].update(report_data)
+            scan_state.update(url, **report_data)
+            if not scope:
+                # só um scan do alvo inteiro serve de cache para novos pedidos do alvo
+                reports_index.record_scan_result(url, profile, caminho_html)
+            finish_history(
+                scan_id, url, "completed",
+                caminho_html=caminho_html, quantidade_riscos=riscos,
+                wall_time=result.wall_time, cpu_time=result.cpu_time, peak_rss_kb=result.peak_rss_kb
+            )
             print(f"Status atualizado para completed: {url}")
+            notify_scan_finished(url, "completed", caminho_html=caminho_html)
 
         except Exception as e:
             print(f"Erro no scan: {e}")
-            with scan_lock:
-                active_scans[url] = {
-                    "status": "failed",
-                    "error": str(e),
-                    "date": datetime.datetime.now().isoformat()
-                }
+            metrics.SCANS.inc(status="failed", profile=profile)
+            scan_state.update(
+                url,
+                status="failed",
+                error=str(e),
+                date=datetime.datetime.now().isoformat()
+            )
+            finish_history(scan_id, url, "failed", error=str(e))
+            notify_scan_finished(url, "failed", error=str(e))
+        finally:
+            scan_state.close_log(url)
 
     @app.route('/')
     def home():
@@ -71,104 +233,554 @@ def create_app():
         if not data or 'url' not in data:
             return jsonify({"error": "URL parameter is required"}), 400
             
-        url = data['url']
-        
-        with scan_lock:
-            if url in active_scans:
-                status = active_scans[url].get('status')
-                if status in ['started', 'running']:
-                    return jsonify({
-                        "status": "already_running",
-                        "message": "Scan already in progress for this URL"
-                    }), 409
-        
-        thread = threading.Thread(
-            target=run_scan_async,
-            args=(url,),
-            daemon=True
-        )
-        thread.start()
+        try:
+            url = normalize_target(str(data['url']))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        profile = str(data.get('profile', default_scan_profile))
+        try:
+            get_profile(profile)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        incremental = data.get('incremental', False)
+        if not isinstance(incremental, bool):
+            return jsonify({"error": "incremental must be a boolean"}), 400
+        try:
+            priority = int(data.get('priority', 0))
+            max_age = int(data.get('max_age', default_cache_max_age))
+        except (TypeError, ValueError):
+            return jsonify({"error": "priority and max_age must be integers"}), 400
+
+        if max_age > 0:
+            cached = get_report_index(reports_dir).cached_result(url, profile, max_age)
+            if cached and report_storage.report_exists(Path(reports_dir) / cached["caminho_html"]):
+                return jsonify({
+                    "status": "cached",
+                    "message": "Fresh report available, no scan started",
+                    "url": url,
+                    "profile": profile,
+                    "finished_at": datetime.datetime.fromtimestamp(cached["finished_at"]).isoformat(),
+                    "caminho_html": cached["caminho_html"],
+                    "report_url": f"/api/reports/html/{cached['caminho_html']}"
+                })
         
-        with scan_lock:
-            active_scans[url] = {
-                "status": "started",
-                "date": datetime.datetime.now().isoformat(),
-                "url": url
-            }
+        scan_id = register_scan(url, {
+            "status": "queued",
+            "date": datetime.datetime.now().isoformat(),
+            "url": url,
+            "profile": profile,
+            "priority": priority,
+            "incremental": incremental
+        })
+        if scan_id is None:
+            running = scan_state.get(url) or {}
+            if running.get("profile", profile) != profile:
+                # o relatório e o cache são por (alvo, perfil): não entrega o resultado de outro perfil
+                return jsonify({
+                    "error": "Scan with another profile already in progress for this URL",
+                    "scan_id": running.get("scan_id"),
+                    "url": url,
+                    "profile": running.get("profile"),
+                    "monitor_url": f"/api/scans/{running.get('scan_id')}"
+                }), 409
+            return jsonify({
+                "status": "attached",
+                "message": "Scan already in progress for this URL, attached to it",
+                "scan_id": running.get("scan_id"),
+                "url": url,
+                "scan_status": running.get("status"),
+                "profile": running.get("profile"),
+                "queue_position": running.get("queue_position"),
+                "monitor_url": f"/api/scans/{running.get('scan_id')}"
+            })
+
+        if not enqueue(scan_id, url, profile, incremental, priority=priority):
+            return jsonify({"error": "Failed to schedule scan", "scan_id": scan_id}), 500
         
         return jsonify({
-            "status": "started",
-            "message": "Scan initiated in background",
+            "status": "queued",
+            "message": "Scan queued for execution",
+            "scan_id": scan_id,
             "url": url,
-            "monitor_url": f"/api/scan/status/{url}"
+            "profile": profile,
+            "incremental": incremental,
+            "queue_position": scan_state.get(url).get("queue_position"),
+            "monitor_url": f"/api/scans/{scan_id}"
+        })
+
+    @app.route('/api/scan/batch', methods=['POST'])
+    def start_batch_scan():
+        """
+        Enfileira vários alvos de uma vez, a partir de `urls` (lista) e/ou `sitemap`.
+
+        URLs do mesmo host viram um único scan (um contexto, um spider, um
+        relatório). Retorna o `batch_id` para acompanhar o progresso agregado.
+        """
+        data = request.get_json(silent=True) or {}
+        urls = data.get('urls') or []
+        if not isinstance(urls, list):
+            return jsonify({"error": "urls must be a list"}), 400
+        if not urls and not data.get('sitemap'):
+            return jsonify({"error": "urls or sitemap parameter is required"}), 400
+
+        profile = str(data.get('profile', default_scan_profile))
+        try:
+            get_profile(profile)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        incremental = data.get('incremental', False)
+        if not isinstance(incremental, bool):
+            return jsonify({"error": "incremental must be a boolean"}), 400
+        try:
+            priority = int(data.get('priority', 0))
+        except (TypeError, ValueError):
+            return jsonify({"error": "priority must be an integer"}), 400
+
+        if len(urls) > MAX_BATCH_URLS:
+            return jsonify({"error": f"Too many URLs (max {MAX_BATCH_URLS})"}), 400
+        if data.get('sitemap'):
+            # o sitemap só completa o lote até o limite
+            try:
+                sitemap_url = normalize_target(str(data['sitemap']))
+                urls = urls + expand_sitemap(sitemap_url, max_urls=MAX_BATCH_URLS - len(urls))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        groups, rejected = group_targets(urls)
+        if not groups:
+            return jsonify({"error": "No valid URL in batch", "rejected": rejected}), 400
+
+        batch_id = new_batch_id()
+        targets, conflicts = [], []
+        for group in list(groups):
+            key = group["key"]
+            scan_id = register_scan(key, {
+                "status": "queued",
+                "date": datetime.datetime.now().isoformat(),
+                "url": key,
+                "urls": group["urls"],
+                "profile": profile,
+                "priority": priority,
+                "incremental": incremental,
+                "batch_id": batch_id
+            })
+            if scan_id is not None:
+                scope = group["urls"] if len(group["urls"]) > 1 else None
+                status = "queued" if enqueue(scan_id, key, profile, incremental, scope, priority=priority) else "failed"
+            else:
+                running = scan_state.get(key) or {}
+                if running.get("profile", profile) != profile:
+                    # alvo já em scan com outro perfil: fica fora do lote
+                    groups.remove(group)
+                    conflicts.append({"url": key, "scan_id": running.get("scan_id"), "profile": running.get("profile")})
+                    continue
+                scan_id, status = running.get("scan_id"), "attached"
+            targets.append({"url": key, "urls": group["urls"], "scan_id": scan_id, "status": status})
+
+        # gravado depois dos conflitos, só com os alvos que ficaram no lote
+        batch = batches.create(groups, batch_id=batch_id, profile=profile)
+        print(f"Lote {batch['batch_id']}: {len(urls)} URLs em {len(groups)} scans")
+        return jsonify({
+            "status": "queued",
+            "batch_id": batch["batch_id"],
+            "profile": profile,
+            "total": len(targets),
+            "targets": targets,
+            "rejected": rejected,
+            "conflicts": conflicts,
+            "monitor_url": f"/api/scan/batch/{batch['batch_id']}"
+        })
+
+    @app.route('/api/scan/batch/<batch_id>', methods=['GET'])
+    def batch_status(batch_id):
+        """Progresso agregado de um lote: status de cada alvo e soma dos riscos"""
+        batch = batches.get(batch_id)
+        if batch is None:
+            return jsonify({"error": "No batch found with this ID"}), 404
+        # alvos cujo estado já expirou vêm do histórico durável
+        get_state = lambda key: scan_state.get(key) or scan_history.latest(key)
+        return jsonify(summarize_batch(batch, get_state))
+
+    @app.route('/api/scan/profiles', methods=['GET'])
+    def list_scan_profiles():
+        """Perfis de scan disponíveis para o campo `profile` de /api/scan"""
+        return jsonify({
+            "default": default_scan_profile,
+            "profiles": [p.to_dict() for p in PROFILES.values()]
         })
 
+    @app.route('/api/scan/cancel/<path:url>', methods=['DELETE'])
+    def cancel_scan(url):
+        """Endpoint para cancelar um scan que ainda está na fila"""
+        url = _scan_key(url)
+        cancelled = scan_state.transition(
+            url, ("queued",),
+            status="cancelled",
+            cancelled_at=datetime.datetime.now().isoformat()
+        )
+        if not cancelled:
+            scan_data = scan_state.get(url)
+            if not scan_data:
+                return jsonify({"error": "No scan found for this URL"}), 404
+            return jsonify({
+                "status": scan_data.get("status"),
+                "message": "Only queued scans can be cancelled"
+            }), 409
+
+        # o job pode estar na fila de outro worker; lá ele é descartado ao ver o status
+        scan_scheduler.cancel(url)
+        scan_state.close_log(url)
+        scan_id = (scan_state.get(url) or {}).get("scan_id")
+        if scan_id:
+            finish_history(scan_id, url, "cancelled")
+
+        return jsonify({"status": "cancelled", "message": "Scan removed from queue", "url": url})
+
+    def live_status(url, offset, scan_id=None):
+        """
+        Resumo ao vivo do scan, com as linhas de log a partir de `offset` (e o
+        long-poll de `wait`). None se o estado expirou ou passou a ser de outro
+        scan durante a espera.
+        """
+        if offset is not None:
+            wait = min(request.args.get("wait", 0, type=float), max_long_poll_wait)
+            if wait > 0:
+                scan_state.wait(url, offset, timeout=wait)
+
+        summary = scan_state.get(url)
+        if summary is None or (scan_id is not None and summary.get("scan_id") != scan_id):
+            return None
+        if offset is not None:
+            summary["logs"], summary["next_offset"] = scan_state.read_logs(url, offset)
+        return summary
+
     @app.route('/api/scan/status/<path:url>')
     def scan_status(url):
-        """Endpoint para verificar status do scan"""
-        with scan_lock:
-            scan_data = active_scans.get(url, {})
-        
-        if not scan_data:
+        """
+        Endpoint para verificar status do scan.
+
+        Retorna um resumo (status, fase, progresso, quantidade de linhas de log).
+        Com `offset`, inclui só as linhas de log a partir dele e o `next_offset`;
+        com `wait` (segundos), aguarda novas linhas antes de responder (long-poll).
+        """
+        url = _scan_key(url)
+        offset = request.args.get("offset", type=int)
+        if scan_state.get(url) is not None:
+            summary = live_status(url, offset)
+            if summary is not None:
+                return jsonify(summary)
+
+        # estado em memória já expirou: responde com o último scan do histórico
+        latest = scan_history.latest(url)
+        if latest is None:
             return jsonify({"error": "No scan found for this URL"}), 404
-            
-        return jsonify(scan_data)
+        return jsonify(_history_view(scan_history.get(latest["scan_id"]), offset))
+
+    @app.route('/api/scan/stream/<path:url>')
+    def scan_stream(url):
+        """
+        Server-Sent Events com as novas linhas de log (`log`), mudanças de
+        progresso (`progress`) e o status final (`status`) do scan.
+
+        Retoma a partir de `offset` ou do header `Last-Event-ID`.
+        """
+        url = _scan_key(url)
+        if scan_state.get(url) is None:
+            return jsonify({"error": "No scan found for this URL"}), 404
+
+        offset = request.args.get("offset", type=int)
+        if offset is None:
+            last_event_id = request.headers.get("Last-Event-ID", "")
+            offset = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+
+        def events(offset):
+            version = None
+            last_progress = None
+            while True:
+                lines, next_offset, progress, phase, version, closed = scan_state.snapshot(url, offset)
+                # linhas anteriores ao buffer do log já foram descartadas
+                for line_number, line in enumerate(lines, start=next_offset - len(lines)):
+                    yield f"id: {line_number}\nevent: log\ndata: {line}\n\n"
+                offset = next_offset
+                if progress != last_progress:
+                    last_progress = progress
+                    yield f"event: progress\ndata: {json_codec.dumps({'phase': phase, 'progress': progress})}\n\n"
+                if closed:
+                    break
+                if scan_state.wait(url, offset, version, timeout=sse_keepalive_interval) == version:
+                    yield ": keep-alive\n\n"
+
+            summary = scan_state.get(url) or {}
+            yield f"event: status\ndata: {json_codec.dumps(summary, default=str)}\n\n"
+
+        return Response(
+            events(offset),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    @app.route('/api/scans/<scan_id>', methods=['GET'])
+    def scan_by_id(scan_id):
+        """
+        Status de um scan pelo `scan_id`: o estado ao vivo enquanto ele é o scan
+        atual da URL, depois o registro do histórico. Aceita `offset` e `wait`
+        como /api/scan/status.
+        """
+        scan = scan_history.get(scan_id, with_logs=False)
+        if scan is None:
+            return jsonify({"error": "No scan found with this ID"}), 404
+
+        url = scan["url"]
+        offset = request.args.get("offset", type=int)
+        live = scan_state.get(url)
+        if live is not None and live.get("scan_id") == scan_id:
+            summary = live_status(url, offset, scan_id)
+            if summary is not None:
+                return jsonify(summary)
+
+        view = _history_view(scan_history.get(scan_id), offset)
+        if view["status"] in ACTIVE_STATUSES:
+            # ficou ativo no histórico, mas o processo que o executava não existe mais
+            view["status"] = "interrupted"
+        return jsonify(view)
+
+    @app.route('/api/scans', methods=['GET'])
+    def list_scans():
+        """Histórico de scans de uma URL (`url`), mais recentes primeiro"""
+        url = request.args.get("url")
+        if not url:
+            return jsonify({"error": "Query parameter 'url' is required"}), 400
+        url = _scan_key(url)
+        limit = min(request.args.get("limit", 20, type=int), 100)
+        return jsonify({"url": url, "scans": [_history_view(scan) for scan in scan_history.for_url(url, limit)]})
+
+    @app.route('/api/zap/pool', methods=['GET'])
+    def zap_pool_status():
+        """Estado dos daemons ZAP do pool (saúde e scans em andamento)"""
+        return jsonify(zap_pool.status())
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """Métricas do processo no formato texto do Prometheus"""
+        return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
 
     @app.route('/api/reports', methods=['GET'])
     def list_reports():
-        """Lista todos os relatórios disponíveis a partir do arquivo JSON local"""
+        """
+        Lista os relatórios do índice SQLite local.
+
+        Suporta paginação (`limit`/`cursor`), filtros, ordenação e requisições
+        condicionais: se o índice não mudou, responde 304 sem consultar os relatórios.
+        """
         try:
-            index_filepath = os.path.join(reports_dir, index_filename)
-            if not os.path.exists(index_filepath):
-                print("Arquivo de índice não encontrado.")
-                return jsonify([])
-
-            with open(index_filepath, "r", encoding="utf-8") as f:
-                reports_index = json.load(f)
-            return jsonify(reports_index)
+            reports_index = get_report_index(reports_dir)
+            generation, updated_at = reports_index.version()
+            etag = f"idx-{generation}"
+            last_modified = datetime.datetime.fromtimestamp(int(updated_at), tz=datetime.timezone.utc)
+
+            not_modified = (
+                request.if_none_match.contains(etag)
+                if request.if_none_match
+                else request.if_modified_since is not None and last_modified <= request.if_modified_since
+            )
+            if not_modified:
+                response = app.response_class(status=304)
+            else:
+                min_risks = {
+                    col: request.args[f"min_{col}"]
+                    for col in ("alto", "medio", "baixo", "informativo", "total")
+                    if f"min_{col}" in request.args
+                }
+                limit = request.args.get("limit", type=int)
+                reports, next_cursor = reports_index.page(
+                    limit=None if limit is None else min(limit, 500),
+                    cursor=request.args.get("cursor"),
+                    offset=request.args.get("offset", 0, type=int),
+                    sort=request.args.get("sort", "data_execucao"),
+                    order=request.args.get("order", "desc"),
+                    url=request.args.get("url"),
+                    since=request.args.get("since"),
+                    until=request.args.get("until"),
+                    min_risks=min_risks,
+                )
+                response = jsonify(reports)
+                if next_cursor:
+                    response.headers["X-Next-Cursor"] = next_cursor
+                    args = request.args.to_dict()
+                    args["cursor"] = next_cursor
+                    response.headers["Link"] = f'<{url_for("list_reports", **args)}>; rel="next"'
+
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             print(f"Erro ao listar relatórios: {e}")
             return jsonify({"error": str(e)}), 500
 
-    @app.route('/api/reports/html/<path:filename>', methods=['GET'])
-    def get_report_html(filename):
-        """Serve um relatório HTML diretamente da pasta reports"""
-        try:
-            reports_path = Path(reports_dir)
-            return send_from_directory(
-                reports_path,
-                filename,
-                mimetype="text/html"
+    @app.route('/api/reports/runs', methods=['GET'])
+    def list_report_runs():
+        """Histórico de execuções de uma URL (mais recentes primeiro), opcionalmente de um `profile`"""
+        url = request.args.get("url")
+        if not url:
+            return jsonify({"error": "url parameter is required"}), 400
+        return jsonify(get_report_index(reports_dir).runs(
+            _scan_key(url), limit=request.args.get("limit", type=int), profile=request.args.get("profile")
+        ))
+
+    @app.route('/api/reports/diff', methods=['GET'])
+    def diff_reports():
+        """
+        Alertas novos, corrigidos e persistentes entre duas execuções.
+
+        Use `base` e `head` (run_id) ou só `url` (e opcionalmente `profile`)
+        para comparar a última execução da URL com a anterior do mesmo alvo e perfil.
+        """
+        reports_index = get_report_index(reports_dir)
+        base_id = request.args.get("base", type=int)
+        head_id = request.args.get("head", type=int)
+        url = request.args.get("url")
+
+        if base_id is None or head_id is None:
+            if not url:
+                return jsonify({"error": "base and head run ids (or url) are required"}), 400
+            latest = reports_index.runs(_scan_key(url), limit=1, profile=request.args.get("profile"))
+            base = latest and reports_index.last_run(
+                latest[0]["target"], latest[0]["profile"], before=latest[0]["run_id"]
             )
-        except FileNotFoundError:
+            if not base:
+                return jsonify({"error": "At least two runs are needed to compare"}), 404
+            head = latest[0]
+        else:
+            base, head = reports_index.get_run(base_id), reports_index.get_run(head_id)
+            if not base or not head:
+                return jsonify({"error": "Run not found"}), 404
+
+        changes = reports_index.diff(base["run_id"], head["run_id"])
+        return jsonify({
+            "base": base,
+            "head": head,
+            "summary": {key: len(findings) for key, findings in changes.items()},
+            **changes
+        })
+
+    @app.route('/api/reports/<int:run_id>/alerts', methods=['GET'])
+    def list_run_alerts(run_id):
+        """
+        Alertas de uma execução em páginas (usado pelo relatório em modo lazy).
+
+        Filtros: `risk` (high, medium, low, info), `offset` e `limit` (máx. 500).
+        """
+        reports_index = get_report_index(reports_dir)
+        if reports_index.get_run(run_id) is None:
+            return jsonify({"error": "Run not found"}), 404
+        risk = request.args.get("risk") or None
+        if risk is not None and risk not in risk_filter_codes:
+            return jsonify({"error": f"Invalid risk: {risk}"}), 400
+        offset = max(0, request.args.get("offset", 0, type=int))
+        limit = min(max(1, request.args.get("limit", 50, type=int)), 500)
+
+        alerts, total = reports_index.run_alerts(
+            run_id, riskcode=risk_filter_codes.get(risk), offset=offset, limit=limit
+        )
+        response = jsonify({
+            "alerts": alerts,
+            "total": total,
+            "offset": offset,
+            "next_offset": offset + limit if offset + limit < total else None
+        })
+        # uma execução gravada não muda: nome, risco e confiança dos alertas são guardados por execução
+        response.headers["Cache-Control"] = "public, max-age=86400"
+        return response
+
+    @app.route('/api/reports/<int:run_id>/stats', methods=['GET'])
+    def get_run_stats(run_id):
+        """Estatísticas da execução: riscos, instâncias e histogramas por confiança, CWE e plugin"""
+        reports_index = get_report_index(reports_dir)
+        run = reports_index.get_run(run_id)
+        if run is None:
+            return jsonify({"error": "Run not found"}), 404
+        stats = reports_index.run_stats(run_id)
+        if stats is None:
+            return jsonify({"error": "Stats not available for this run"}), 404
+        response = jsonify({"run": run, **stats})
+        response.headers["Cache-Control"] = "public, max-age=86400"
+        return response
+
+    @app.route('/api/reports/<int:run_id>/alerts/<int:alert_id>/instances', methods=['GET'])
+    def list_run_alert_instances(run_id, alert_id):
+        """URLs afetadas por um alerta numa execução, em páginas (`offset`, `limit` máx. 500)"""
+        offset = max(0, request.args.get("offset", 0, type=int))
+        limit = min(max(1, request.args.get("limit", 100, type=int)), 500)
+        instances = get_report_index(reports_dir).run_instances(run_id, alert_id, offset=offset, limit=limit + 1)
+        response = jsonify({
+            "instances": instances[:limit],
+            "offset": offset,
+            "next_offset": offset + limit if len(instances) > limit else None
+        })
+        response.headers["Cache-Control"] = "public, max-age=86400"
+        return response
+
+    def send_stored(base_dir, filename, cache_control, as_attachment=False, transform=None):
+        """
+        Envia um arquivo gravado por `report_storage`: a variante comprimida
+        aceita pelo cliente (`Content-Encoding`) ou o conteúdo descomprimido.
+        `send_file` cuida de ETag, `Range` e respostas 304/206.
+        """
+        path = safe_join(str(base_dir), filename)
+        if path is None or not report_storage.report_exists(path):
             return jsonify({"error": "Report not found"}), 404
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+        accepted = {enc for enc in ("br", "gzip") if request.accept_encodings[enc]}
+        variant = None if transform else report_storage.select_variant(path, accepted)
+        if variant:
+            encoding, file_path = variant
+            response = send_file(file_path, mimetype=mimetype, conditional=True,
+                                 as_attachment=as_attachment, download_name=os.path.basename(filename))
+            if encoding:
+                response.headers["Content-Encoding"] = encoding
+        else:
+            data = report_storage.read_report(path)
+            if transform:
+                data = transform(data.decode("utf-8")).encode("utf-8")
+            response = send_file(io.BytesIO(data), mimetype=mimetype, conditional=True,
+                                 as_attachment=as_attachment, download_name=os.path.basename(filename),
+                                 etag=hashlib.sha1(data).hexdigest())
+        response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = cache_control
+        return response
+
+    @app.route('/api/reports/html/<path:filename>', methods=['GET'])
+    def get_report_html(filename):
+        """Serve um relatório HTML (pré-comprimido) da pasta reports"""
+        return send_stored(reports_dir, filename, "no-cache")
+
+    @app.route('/api/reports/assets/<path:filename>', methods=['GET'])
+    def get_report_asset(filename):
+        """CSS/JS compartilhado dos relatórios; o nome é o hash do conteúdo, então nunca muda"""
+        return send_stored(
+            Path(reports_dir) / report_storage.ASSETS_DIRNAME, filename, "public, max-age=31536000, immutable"
+        )
 
     @app.route('/api/reports/delete/<path:filename>/<path:urlexecutado>', methods=['DELETE'])
     def delete_report(filename, urlexecutado):
         """Endpoint para deletar um relatório específico"""
         try:
-            json_path = Path(reports_dir) / index_filename
-            if json_path.exists():
-                with open(json_path, "r", encoding="utf-8") as f:
-                    reports = json.load(f)
-            else:
-                reports = []
-
-            report = next((r for r in reports if r.get("caminho_html") == filename), None)
+            reports_index = get_report_index(reports_dir)
+            report = reports_index.get_by_html(filename)
 
             if not report:
-                report = next((r for r in reports if r.get("url_executado") == urlexecutado), None)
+                report = reports_index.get(urlexecutado)
 
             if not report:
                 return jsonify({"error": "Report not found"}), 404
             
-            reports = [r for r in reports if r != report]
-            with open(json_path, "w", encoding="utf-8") as f:
-                json.dump(reports, f, ensure_ascii=False, indent=4)
+            reports_index.delete(report["url_executado"])
                 
-            report_path = Path(reports_dir) / report.get("caminho_html", "")
-            if report_path.exists():
-                report_path.unlink()
+            report_storage.delete_report(Path(reports_dir) / report.get("caminho_html", ""))
 
             return jsonify({"status": "success", "message": "Report deleted successfully"})
         except Exception as e:
@@ -176,17 +788,12 @@ def create_app():
         
     @app.route('/api/reports/download/<path:filename>', methods=['GET'])
     def download_report(filename):
-        """Endpoint para baixar um relatório específico"""
-        try:
-            reports_path = Path(reports_dir)
-            return send_from_directory(
-                reports_path,
-                filename,
-                as_attachment=True,
-                mimetype="text/html"
-            )
-        except FileNotFoundError:
-            return jsonify({"error": "Report not found"}), 404
+        """Endpoint para baixar um relatório específico (HTML autocontido, com CSS/JS embutidos)"""
+        assets_dir = Path(reports_dir) / report_storage.ASSETS_DIRNAME
+        return send_stored(
+            reports_dir, filename, "no-cache", as_attachment=True,
+            transform=lambda report_html: report_storage.inline_assets(report_html, assets_dir)
+        )
 
     return app
 
@@ -0,0 +1,15 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fake_zap import FakeZap  # noqa: E402
+
+
+@pytest.fixture
+def fake_zap():
+    with FakeZap(alerts=5, instances=2, progress_step=50) as fake:
+        yield fake
@@ -0,0 +1,148 @@
+import json
+import socketserver
+import threading
+from email import message_from_string, policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.notifier import NotificationDispatcher
+
+
+class _Stub:
+    """Servidor local em thread; `received` guarda o que chegou."""
+
+    def __init__(self, server_class, handler):
+        self.received = []
+        self.server = server_class(("127.0.0.1", 0), handler)
+        self.server.stub = self
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        stub.received.append(body["text"])
+        status = stub.statuses.pop(0) if stub.statuses else 200
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 stub")
+        for raw in self.rfile:
+            command = raw.decode().strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stub")
+            elif command == "DATA":
+                self.reply("354 fim com .")
+                lines = []
+                for data in self.rfile:
+                    if data == b".\r\n":
+                        break
+                    lines.append(data.decode())
+                self.server.stub.received.append("".join(lines))
+                self.reply("250 ok")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def webhook():
+    stub = _Stub(ThreadingHTTPServer, _WebhookHandler)
+    stub.statuses = []
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def smtp():
+    stub = _Stub(socketserver.ThreadingTCPServer, _SMTPHandler)
+    yield stub
+    stub.stop()
+
+
+def _event(url, status="completed", **fields):
+    return {"url": url, "status": status, **fields}
+
+
+def test_events_in_the_window_become_one_digest(webhook):
+    dispatcher = NotificationDispatcher(google_chat_webhook=f"http://127.0.0.1:{webhook.port}/hook",
+                                        batch_window=0.5, report_base_url="https://scanner.example/")
+    dispatcher.notify(_event("http://a.example", quantidade_riscos={"alto": 1}, caminho_html="/r/a_example.html"))
+    dispatcher.notify(_event("http://b.example"))
+    dispatcher.notify(_event("http://c.example", status="failed", error="timeout"))
+    assert dispatcher.flush(timeout=5)
+
+    [message] = webhook.received
+    assert message.startswith("📋 3 scans finalizados (2 concluídos, 1 com falha)")
+    assert "Alto: 1" in message
+    assert "https://scanner.example/api/reports/html/a_example.html" in message
+    assert "Erro: timeout" in message
+
+
+def test_retries_transient_errors(webhook):
+    webhook.statuses = [503, 429]
+    dispatcher = NotificationDispatcher(google_chat_webhook=f"http://127.0.0.1:{webhook.port}/hook",
+                                        batch_window=0, backoff=0.01)
+    dispatcher.notify(_event("http://a.example"))
+    assert dispatcher.flush(timeout=5)
+    assert len(webhook.received) == 3
+
+
+def test_drops_permanent_errors_without_retrying(webhook):
+    webhook.statuses = [400]
+    dispatcher = NotificationDispatcher(google_chat_webhook=f"http://127.0.0.1:{webhook.port}/hook",
+                                        batch_window=0, backoff=0.01)
+    dispatcher.notify(_event("http://a.example"))
+    assert dispatcher.flush(timeout=5)
+    assert len(webhook.received) == 1
+
+
+def test_sends_email_over_smtp(smtp):
+    dispatcher = NotificationDispatcher(smtp_config={
+        "host": "127.0.0.1", "port": smtp.port, "sender": "scanner@example.com",
+        "recipients": ["sec@example.com"], "tls": "none",
+    }, batch_window=0)
+    dispatcher.notify(_event("http://a.example"))
+    assert dispatcher.flush(timeout=5)
+
+    [raw] = smtp.received
+    message = message_from_string(raw, policy=policy.default)
+    assert message["Subject"] == "ZapScanner: scan concluído - http://a.example"
+    assert message["To"] == "sec@example.com"
+    assert "✅ Scan concluído: http://a.example" in message.get_body().get_content()
+
+
+def test_unreachable_channel_never_raises():
+    dispatcher = NotificationDispatcher(google_chat_webhook="http://127.0.0.1:9/hook",
+                                        batch_window=0, max_retries=1, backoff=0.01)
+    dispatcher.notify(_event("http://a.example"))
+    assert dispatcher.flush(timeout=5)
+
+
+def test_without_channels_notify_is_a_no_op():
+    dispatcher = NotificationDispatcher()
+    dispatcher.notify(_event("http://a.example"))
+    assert dispatcher._thread is None
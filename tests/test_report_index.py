@@ -0,0 +1,75 @@
+import pytest
+
+from services.report_index import ReportIndex
+
+
+def _record(url, date, total=0):
+    return {
+        "url_executado": url,
+        "data_execucao": date,
+        "quantidade_riscos": {"alto": total, "total": total},
+        "caminho_html": f"/reports/{url.split('//')[1]}.html",
+    }
+
+
+def _alert(ref, *uris):
+    return {
+        "pluginid": ref.split("-")[0], "alertRef": ref, "name": f"Alerta {ref}", "riskcode": "2",
+        "instances": [{"uri": uri, "method": "GET", "param": ""} for uri in uris],
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ReportIndex(str(tmp_path))
+
+
+def test_page_walks_every_report_with_the_cursor(index):
+    for i in range(7):
+        index.upsert(_record(f"http://host{i}.example", f"2024-01-0{i + 1}T00:00:00", total=i))
+
+    seen, cursor = [], None
+    while True:
+        records, cursor = index.page(limit=3, cursor=cursor)
+        seen += [r["url_executado"] for r in records]
+        if cursor is None:
+            break
+    assert seen == [f"http://host{i}.example" for i in reversed(range(7))]
+
+    records, _ = index.page(sort="total", order="asc", min_risks={"total": 5})
+    assert [r["quantidade_riscos"]["total"] for r in records] == [5, 6]
+    records, cursor = index.page(limit=2, offset=6)
+    assert len(records) == 1 and cursor is None
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"limit": 0}, {"limit": -1}, {"offset": -2}, {"sort": "caminho_html"}, {"order": "up"}, {"cursor": "???"},
+])
+def test_page_rejects_invalid_arguments(index, kwargs):
+    with pytest.raises(ValueError):
+        index.page(**kwargs)
+
+
+def test_diff_between_runs(index):
+    record = _record("http://a.example", "2024-01-01T00:00:00")
+    base = index.record_run(record, [_alert("1-1", "http://a.example/x"), _alert("2-1", "http://a.example/y")])
+    head = index.record_run(record, [_alert("1-1", "http://a.example/x"), _alert("3-1", "http://a.example/z")])
+
+    diff = index.diff(base, head)
+    assert [f["alertRef"] for f in diff["new"]] == ["3-1"]
+    assert [f["alertRef"] for f in diff["fixed"]] == ["2-1"]
+    assert [(f["alertRef"], f["uri"]) for f in diff["unchanged"]] == [("1-1", "http://a.example/x")]
+
+
+def test_last_run_stays_within_target_and_profile(index):
+    record = _record("http://a.example", "2024-01-01T00:00:00")
+    deep = index.record_run(record, [], target="http://a.example", profile="deep")
+    quick = index.record_run(record, [], target="http://a.example", profile="quick")
+    index.record_run(record, [], target="http://a.example#scope-abc", profile="deep")
+
+    assert index.last_run("http://a.example", "deep")["run_id"] == deep
+    assert index.last_run("http://a.example", "quick", before=quick) is None
+    # `runs` lista por URL executada: inclui a série agrupada do mesmo host
+    assert [run["target"] for run in index.runs("http://a.example", profile="deep")] == [
+        "http://a.example#scope-abc", "http://a.example",
+    ]
@@ -0,0 +1,76 @@
+import threading
+
+from services.scheduler import ScanScheduler
+
+
+def _blocker(scheduler, key="busy"):
+    """Ocupa o único worker até `release.set()`."""
+    started, release = threading.Event(), threading.Event()
+
+    def job():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(key, job)
+    assert started.wait(5)
+    return release
+
+
+def test_runs_by_priority_then_fifo():
+    scheduler = ScanScheduler(max_workers=1)
+    release = _blocker(scheduler)
+    order, done = [], threading.Event()
+    scheduler.submit("low", order.append, "low")
+    scheduler.submit("first", order.append, "first", priority=5)
+    scheduler.submit("second", order.append, "second", priority=5)
+    scheduler.submit("last", lambda: (order.append("last"), done.set()), priority=-1)
+    assert scheduler.position("first") == 1 and scheduler.position("last") == 4
+    release.set()
+    assert done.wait(5)
+    assert order == ["first", "second", "low", "last"]
+
+
+def test_cancelled_job_never_runs():
+    scheduler = ScanScheduler(max_workers=1)
+    release = _blocker(scheduler)
+    ran, done = [], threading.Event()
+    scheduler.submit("a", ran.append, "a")
+    scheduler.submit("b", lambda: (ran.append("b"), done.set()))
+    assert scheduler.cancel("a")
+    assert not scheduler.cancel("a")
+    assert scheduler.position("b") == 1
+    release.set()
+    assert done.wait(5)
+    assert ran == ["b"]
+
+
+def test_resubmit_replaces_the_queued_job():
+    scheduler = ScanScheduler(max_workers=1)
+    release = _blocker(scheduler)
+    ran, done = [], threading.Event()
+    scheduler.submit("a", ran.append, "old")
+    scheduler.submit("a", lambda: (ran.append("new"), done.set()))
+    assert scheduler.stats()["queued"] == 1
+    release.set()
+    assert done.wait(5)
+    assert ran == ["new"]
+
+
+def test_resubmit_while_running_waits_for_the_running_job():
+    scheduler = ScanScheduler(max_workers=2)
+    release = _blocker(scheduler, key="a")
+    second = threading.Event()
+    scheduler.submit("a", second.set)
+    # há um worker livre, mas a mesma chave não roda duas vezes ao mesmo tempo
+    assert not second.wait(0.3)
+    assert scheduler.is_running("a") and scheduler.position("a") == 1
+    release.set()
+    assert second.wait(5)
+
+
+def test_failing_job_frees_the_worker():
+    scheduler = ScanScheduler(max_workers=1)
+    done = threading.Event()
+    scheduler.submit("boom", lambda: 1 / 0)
+    scheduler.submit("next", done.set)
+    assert done.wait(5)
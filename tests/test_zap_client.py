@@ -0,0 +1,76 @@
+import pytest
+
+from conftest import ROOT
+from services.poller import StatusPoller
+from services.report_index import get_report_index
+from services.scanner import ZapScanner
+from services.zap_client import ZapApiError, ZapClient
+
+
+@pytest.fixture
+def client(fake_zap):
+    zap = ZapClient(base_url=fake_zap.url, session_reset_every=0)
+    yield zap
+    zap.close()
+
+
+def test_reuses_one_session_for_every_call(client, fake_zap):
+    assert client.version() == "2.16.1"
+    assert client.new_context("ctx")
+    client.include_in_context("ctx", "http://a.example.*")
+    client.remove_context("ctx")
+    assert fake_zap.requests == 4
+
+
+def test_spider_and_ascan_progress(client):
+    spider_id = client.spider_scan("http://a.example", context_name="ctx")
+    assert [client.spider_status(spider_id) for _ in range(2)] == [50, 100]
+    ascan_id = client.ascan_scan("http://a.example")
+    assert client.ascan_status(ascan_id) == 50
+
+
+def test_iter_alerts_pages_through_every_instance(client):
+    # a API devolve um item por instância: 5 alertas x 2 instâncias
+    alerts = list(client.iter_alerts("http://a.example", page_size=3))
+    assert len(alerts) == 10
+    assert len({a["alertRef"] for a in alerts}) == 5
+
+
+def test_unreachable_daemon_raises_zap_api_error(fake_zap):
+    fake_zap.stop()
+    zap = ZapClient(base_url=fake_zap.url, timeout=1, session_reset_every=0)
+    with pytest.raises(ZapApiError):
+        zap.version()
+
+
+def test_session_reset_waits_for_other_processes(fake_zap):
+    busy = [True]
+    zap = ZapClient(base_url=fake_zap.url, session_reset_every=1, session_reset_guard=lambda: not busy[0])
+    resets = []
+    zap.new_session = lambda: resets.append(1)
+    with zap.track_scan():
+        pass
+    assert resets == []
+    busy[0] = False
+    with zap.track_scan():
+        pass
+    assert resets == [1]
+
+
+def test_native_scan_writes_report_and_run(fake_zap, client, tmp_path, monkeypatch):
+    monkeypatch.setenv("REPORTS_DIR", str(tmp_path))
+    monkeypatch.setattr("services.scanner.PASSIVE_SCAN_POLL_INTERVAL", 0.01)
+    scanner = ZapScanner(
+        "/nonexistent/run-zap.sh", tmp_path, ROOT / "templates", "model-reports-dark.html",
+        zap_client=client, mode="native", poller=StatusPoller(min_interval=0.01, max_interval=0.05),
+    )
+    progress = []
+    result = scanner.execute("http://a.example", progress_callback=lambda phase, pct: progress.append((phase, pct)),
+                             profile="quick")
+
+    assert ("spider", 100) in progress and ("ascan", 100) in progress
+    assert result.report_html.endswith("a_example__quick.html")
+    index = get_report_index(str(tmp_path))
+    [run] = index.runs("http://a.example")
+    assert (run["target"], run["profile"]) == ("http://a.example", "quick")
+    assert index.get(run["url_executado"])["quantidade_riscos"]["total"] == 5